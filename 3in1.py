@@ -1,27 +1,100 @@
 import base64 
-from flask import Flask, Blueprint, render_template, request, jsonify, send_file, session
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import hmac
+from flask import Flask, Blueprint, Response, render_template, request, jsonify, send_file, session, g as request_ctx
+from PIL import Image, ImageDraw, ImageFilter
+from werkzeug.exceptions import RequestEntityTooLarge
 import random
 import io
+import json
 import time
 import math
 import os
+import threading
 import numpy as np
 from datetime import datetime
-from collections import defaultdict
+from collections import namedtuple
+from backgrounds import BackgroundCache
+from captcha_pool import CaptchaPool
+from flask.json.provider import DefaultJSONProvider
+from flask.sessions import SecureCookieSessionInterface
+from glyph_atlas import GlyphAtlas, HanziAtlas, hanzi_atlas_path
+from metrics import Registry
+from profiler import SamplingProfiler, collapse
+from rate_limiter import SharedRateLimiter, rate_limit, shared_memory_name
+from render_executor import RenderExecutor
+from track_analyzer import IncrementalTrackAnalyzer, TrackAnalyzer
+from track_codec import decode_track
+from verification_store import VerificationStore
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'  # 生产环境需要更安全的密钥
+app.config['MAX_CONTENT_LENGTH'] = 512 * 1024  # 请求体上限，超出返回 413
 
 # 配置
 REQUEST_LIMIT = 8  # 10秒内最多8次请求
-TIME_WINDOW = 10  # 10秒时间窗口
+TIME_WINDOW = 10  # 10秒时间窗口（滑动窗口）
+WORD_REQUEST_LIMIT = 8  # 汉字验证码：10秒内最多8次
+SLIDE_REQUEST_LIMIT = 8  # 滑块验证码：10秒内最多8次
+SLIDE_IMAGE_REQUEST_LIMIT = 20  # 滑块图片：每个验证码两张图，另留重试余量
 CAPTCHA_TIMEOUT = 30  # 验证码30秒过期
 TIMEOUT = 30  # 超时时间（秒）
 
-# IP频率限制相关变量
-ip_request_count = defaultdict(int)
-ip_first_request_time = {}
+# 预渲染验证码池配置
+POOL_MIN_SIZE = 4  # 池最小目标大小
+POOL_MAX_SIZE = 64  # 池容量上限
+POOL_REFILL_HORIZON = 2  # 预渲染约2秒的请求量
+RENDER_PROCESSES = int(os.environ.get('CAPTCHA_RENDER_PROCESSES', 0))  # 渲染进程数，0 表示在当前线程渲染
+VERIFY_CAPACITY = 16384  # 最多同时存在的滑块验证码数量
+
+# 分块上传轨迹配置
+STREAM_MAX_BYTES = 256 * 1024  # 请求体上限
+STREAM_MAX_LINE = 64 * 1024  # 单行（一块轨迹点）上限
+STREAM_MAX_POINTS = 5000  # 轨迹点数上限（5秒内每毫秒一个点）
+
+# 紧凑轨迹格式配置（mouse_tracks_b64 / mouse_trace_b64）
+TRACK_MAX_BYTES = 32 * 1024  # 解码后的字节数上限
+TRACK_MAX_POINTS = 5000  # 轨迹点数上限（JSON 轨迹同样适用，超过时拒绝而不是抽样）
+
+# IP频率限制（同一部署的所有 worker 进程共享一张限流表，表在第一次限流时创建；
+# 下线时 python rate_limiter.py --unlink 删除，CAPTCHA_RATE_LIMIT_SHM 可指定表名）
+rate_limiter = SharedRateLimiter(shared_memory_name(os.path.dirname(os.path.abspath(__file__))))
+
+# 监控指标（/metrics，Prometheus 文本格式；每个 worker 进程各自统计）
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram('captcha_stage_seconds', '请求内各阶段耗时（秒）', ('captcha', 'stage'))
+REQUEST_SECONDS = metrics.histogram('captcha_request_seconds', '请求处理耗时（秒）', ('endpoint',))
+RESPONSES = metrics.counter('captcha_responses', '按接口和状态码统计的响应数', ('endpoint', 'status'))
+RATE_LIMITED = metrics.counter('captcha_rate_limited', '被限流（429）的请求数', ('endpoint',))
+RENDERS = metrics.counter('captcha_renders', '渲染的验证码图片数', ('captcha',))
+VERIFIES = metrics.counter('captcha_verifies', '验证请求数', ('captcha',))
+SUCCESSES = metrics.counter('captcha_successes', '验证成功数', ('captcha',))
+EXPIRIES = metrics.counter('captcha_expiries', '验证码过期数', ('captcha',))
+RENDER_SECONDS = metrics.histogram('captcha_render_seconds', '渲染任务从提交到取得结果的耗时（秒）', ('captcha', 'mode'))
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """记录会话反序列化和序列化耗时"""
+
+    def open_session(self, app, request):
+        with STAGE_SECONDS.time('session', 'open'):
+            return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        with STAGE_SECONDS.time('session', 'save'):
+            return super().save_session(app, session, response)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """记录 JSON 编码和解码耗时"""
+
+    def dumps(self, obj, **kwargs):
+        with STAGE_SECONDS.time('json', 'dumps'):
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        with STAGE_SECONDS.time('json', 'loads'):
+            return super().loads(s, **kwargs)
+
+app.session_interface = TimedSessionInterface()
+app.json = TimedJSONProvider(app)
 
 # 数学验证码配置
 CAPTCHA_LENGTH = 5
@@ -30,6 +103,7 @@ IMG_HEIGHT = 100  # 高度增加66%
 NOISE_POINTS = 100  # 噪点数量增加
 FONT_SIZE = 20  # 字体放大
 LINE_NUM = 3  # 干扰线数量增加
+GLYPH_CHARS = '0123456789+-×÷ '  # 算式用到的全部字形
 
 # 汉字验证码配置
 HANZI_IMG_WIDTH = 400
@@ -40,6 +114,23 @@ HANDLE_SIZE = 33  # 点击区域大小
 HANZI_LIST = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社事者平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
 
 # 滑块验证码配置
+# 滑块验证码参数：背景编号、缺口位置和随机种子，足以确定性地重新渲染图片
+SlideParams = namedtuple('SlideParams', 'bg_index gap_x gap_y trap_x trap_y seed')
+
+class SlideEntry:
+    """验证信息存储中预分配的记录：参数记录和首次获取时编码的图片字节"""
+    __slots__ = ('params', 'start_time', 'bg_png', 'gap_png')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """释放时清空记录，供下一个验证码复用"""
+        self.params = None
+        self.start_time = 0.0
+        self.bg_png = None
+        self.gap_png = None
+
 class CaptchaGenerator:
     def __init__(self):
         self.bg_width = 300  # 背景图片宽度
@@ -47,25 +138,21 @@ class CaptchaGenerator:
         self.gap_width = 40   # 缺口宽度
         self.gap_height = 40  # 缺口高度
         self.bg_dir = 'static'  # 背景图片目录
+        self.bg_pack = 'backgrounds.pack'  # 背景资源包（python backgrounds.py static 生成）
         self.expire_time = 30  # 验证码有效期（秒）
+        # 预解码、预缩放的背景图缓存（有资源包时只读资源包，否则监视背景目录的增删）
+        self.bg_cache = BackgroundCache(self.bg_dir, (self.bg_width, self.bg_height), pack_path=self.bg_pack)
 
-    def _get_random_bg_image(self):
-        """随机获取一张背景图片"""
-        bg_files = [f for f in os.listdir(self.bg_dir) if f.endswith(('.png', '.jpg', '.jpeg'))]
-        bg_file = random.choice(bg_files)
-        bg_path = os.path.join(self.bg_dir, bg_file)
-        return Image.open(bg_path).convert('RGBA')
-
-    def _create_gap_area(self, bg_image):
-        """创建真实缺口和陷阱缺口"""
+    def _random_gap_positions(self, rng):
+        """生成真实缺口和陷阱缺口的位置"""
         # 生成真实缺口位置
-        gap_x = random.randint(100, self.bg_width - self.gap_width - 50)
-        gap_y = random.randint(10, self.bg_height - self.gap_height - 10)
+        gap_x = rng.randint(100, self.bg_width - self.gap_width - 50)
+        gap_y = rng.randint(10, self.bg_height - self.gap_height - 10)
 
         # 生成陷阱缺口位置（确保与真实缺口有足够距离且不在同一高度）
         while True:
-            trap_x = random.randint(50, self.bg_width - self.gap_width - 50)
-            trap_y = random.randint(10, self.bg_height - self.gap_height - 10)
+            trap_x = rng.randint(50, self.bg_width - self.gap_width - 50)
+            trap_y = rng.randint(10, self.bg_height - self.gap_height - 10)
             
             # 确保陷阱缺口与真实缺口的距离足够远（至少80像素）且不在同一高度（至少30像素）
             distance = math.sqrt((trap_x - gap_x)**2 + (trap_y - gap_y)**2)
@@ -74,6 +161,12 @@ class CaptchaGenerator:
             if distance >= 80 and height_diff >= 30:
                 break
 
+        return gap_x, gap_y, trap_x, trap_y
+
+    def _create_gap_area(self, bg_image, params):
+        """创建真实缺口和陷阱缺口"""
+        gap_x, gap_y, trap_x, trap_y = params.gap_x, params.gap_y, params.trap_x, params.trap_y
+
         # 创建真实缺口图片
         gap_image = bg_image.crop((gap_x, gap_y, gap_x + self.gap_width, gap_y + self.gap_height))
         
@@ -92,94 +185,67 @@ class CaptchaGenerator:
         # 将遮罩应用到背景图
         bg_image = Image.alpha_composite(bg_image, mask)
         
-        return bg_image, gap_image, gap_x, gap_y, trap_x, trap_y
+        return bg_image, gap_image
+
+    def generate_params(self):
+        """生成验证码参数（只记录背景编号、缺口位置和随机种子，不渲染图片）"""
+        with STAGE_SECONDS.time('slide', 'params'):
+            seed = random.getrandbits(32)
+            rng = random.Random(seed)
+            bg_index = self.bg_cache.random_index(rng)
+            if bg_index is None:
+                raise LookupError('没有可用的背景图')
+            gap_x, gap_y, trap_x, trap_y = self._random_gap_positions(rng)
+            return SlideParams(bg_index, gap_x, gap_y, trap_x, trap_y, seed)
+
+    def _get_bg_image(self, params):
+        """按参数中的背景编号取已调整大小的背景图片；背景已被移除时抛出 LookupError，不换成其他背景"""
+        bg_image = self.bg_cache.image(params.bg_index)
+        if bg_image is None:
+            raise LookupError(f'背景 {params.bg_index} 已不可用')
+        return bg_image
+
+    def render(self, params):
+        """按参数确定性地渲染背景图和缺口图"""
+        return self._create_gap_area(self._get_bg_image(params), params)
+
+    def render_bg_image(self, params):
+        """只渲染带遮罩的背景图"""
+        return self.render(params)[0]
+
+    def render_gap_image(self, params):
+        """只渲染缺口图"""
+        bg_image = self._get_bg_image(params)
+        return bg_image.crop((params.gap_x, params.gap_y,
+                              params.gap_x + self.gap_width, params.gap_y + self.gap_height))
 
     def generate(self):
         """生成验证码"""
-        # 获取并调整背景图片大小
-        bg_image = self._get_random_bg_image()
-        bg_image = bg_image.resize((self.bg_width, self.bg_height))
-        
-        # 创建缺口
-        bg_image, gap_image, gap_x, gap_y, trap_x, trap_y = self._create_gap_area(bg_image)
+        params = self.generate_params()
+        bg_image, gap_image = self.render(params)
         
         return {
+            'params': params,
             'bg_image': bg_image,
             'gap_image': gap_image,
-            'gap_x': gap_x,
-            'gap_y': gap_y,
-            'trap_x': trap_x,
-            'trap_y': trap_y,
+            'gap_x': params.gap_x,
+            'gap_y': params.gap_y,
+            'trap_x': params.trap_x,
+            'trap_y': params.trap_y,
             'gap_width': self.gap_width,
             'gap_height': self.gap_height,
             'expire_time': self.expire_time
         }
 
-class TrackAnalyzer:
-    def __init__(self):
-        self.min_track_length = 10     # 最小轨迹点数
-        self.max_speed = 2000          # 最大速度（像素/秒）
-        self.max_deviation = 50        # 最大垂直偏移
-        self.min_y_changes = 3         # 最小Y轴变化次数
-        self.min_y_change = 1          # 最小Y轴变化幅度（像素）
-        self.max_slide_time = 5000     # 最大滑动时间（毫秒）
-        self.min_slide_time = 100      # 最小滑动时间（毫秒）
-
-    def analyze_tracks(self, tracks):
-        """分析鼠标轨迹是否合理"""
-        if len(tracks) < self.min_track_length:
-            return False, "轨迹过短"
-
-        # 计算总滑动时间
-        total_time = tracks[-1]['timestamp'] - tracks[0]['timestamp']
-        if total_time > self.max_slide_time:
-            return False, "滑动时间过长"
-        if total_time < self.min_slide_time:
-            return False, "滑动时间过短"
-
-        # 记录Y轴方向的变化次数
-        y_changes = 0
-        last_y = tracks[0]['y']
-        
-        # 检查速度和Y轴变化
-        for i in range(1, len(tracks)):
-            prev = tracks[i-1]
-            curr = tracks[i]
-            
-            # 计算两点间的时间和距离
-            dt = (curr['timestamp'] - prev['timestamp']) / 1000  # 转换为秒
-            if dt == 0:
-                return False, "移动速度异常"
-                
-            dx = curr['x'] - prev['x']
-            dy = curr['y'] - prev['y']
-            
-            # 计算速度
-            speed = math.sqrt(dx*dx + dy*dy) / dt
-            if speed > self.max_speed:
-                return False, "移动速度过快"
-            
-            # 检查垂直方向的偏移
-            if abs(dy) > self.max_deviation:
-                return False, "垂直移动幅度过大"
-            
-            # 检测Y轴的变化
-            if abs(curr['y'] - last_y) >= self.min_y_change:
-                y_changes += 1
-                last_y = curr['y']
-
-        # 如果Y轴变化次数太少，判定为机器操作
-        if y_changes < self.min_y_changes:
-            return False, "移动轨迹过于平直"
-
-        return True, "轨迹正常"
-
 # 蓝图定义
 math_captcha_bp = Blueprint('math_captcha', __name__, url_prefix='/math')
 word_captcha_bp = Blueprint('word_captcha', __name__, url_prefix='/word')
 slide_captcha_bp = Blueprint('slide_captcha', __name__, url_prefix='/slide')
 
 # 数学验证码部分
+# 启动时预光栅化算式字形
+glyph_atlas = GlyphAtlas.from_truetype("arial.ttf", FONT_SIZE, GLYPH_CHARS)
+
 def generate_math_expression():
     operators = ['+', '-', '×', '÷']
     op = random.choice(operators)
@@ -205,6 +271,7 @@ def generate_math_expression():
     return expression, str(result)
 
 def generate_captcha():
+    clock = STAGE_SECONDS.stages('math')
     expression, result = generate_math_expression()
 
     img = Image.new('RGB', (IMG_WIDTH, IMG_HEIGHT), (255, 255, 255))
@@ -216,32 +283,25 @@ def generate_captcha():
         g = 245 + int(10 * y / IMG_HEIGHT)
         b = 255 - int(15 * y / IMG_HEIGHT)
         draw.line([(0, y), (IMG_WIDTH, y)], fill=(r, g, b))
+    clock.lap('background')
 
-    try:
-        font = ImageFont.truetype("arial.ttf", FONT_SIZE)
-    except:
-        font = ImageFont.load_default()
-        char_spacing = FONT_SIZE * 0.8
-    else:
-        bbox = draw.textbbox((0, 0), expression, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        char_spacing = FONT_SIZE * 0.5
+    # 字形度量和遮罩均来自启动时构建的图集
+    bbox = glyph_atlas.textbbox(expression)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
 
-    x = (IMG_WIDTH - text_width) // 2 if font else (IMG_WIDTH - len(expression) * char_spacing) // 2
-    y = (IMG_HEIGHT - text_height) // 2 if font else (IMG_HEIGHT - FONT_SIZE) // 2
+    x = (IMG_WIDTH - text_width) // 2
+    y = (IMG_HEIGHT - text_height) // 2
+    clock.lap('layout')
 
     for i, char in enumerate(expression):
-        if font:
-            char_width = draw.textlength(char, font=font)
-        else:
-            char_width = char_spacing
+        char_width = glyph_atlas.textlength(char)
         
-        draw.text((x + random.randint(-3, 3), y + random.randint(-2, 2)),
-                  char,
-                  fill=(random.randint(0, 100), random.randint(0, 100), random.randint(0, 100)),
-                  font=font)
+        glyph_atlas.draw_char(draw, (x + random.randint(-3, 3), y + random.randint(-2, 2)),
+                              char,
+                              fill=(random.randint(0, 100), random.randint(0, 100), random.randint(0, 100)))
         x += char_width + random.randint(8, 12)
+    clock.lap('text')
 
     for _ in range(LINE_NUM):
         center_x = IMG_WIDTH // 2
@@ -275,6 +335,7 @@ def generate_captcha():
             y1 = IMG_HEIGHT - 1
         draw.ellipse([x0, y0, x1, y1], 
                     fill=(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)))
+    clock.lap('noise')
 
     return img, result
 
@@ -438,75 +499,83 @@ def index():
     """
 
 @math_captcha_bp.route('/captcha')
+@rate_limit(rate_limiter, 'math', REQUEST_LIMIT, TIME_WINDOW)
 def get_captcha():
-    client_ip = request.remote_addr
-    current_time = time.time()
-    
-    if client_ip in ip_first_request_time:
-        if current_time - ip_first_request_time[client_ip] > TIME_WINDOW:
-            ip_request_count[client_ip] = 0
-            ip_first_request_time[client_ip] = current_time
-        elif ip_request_count[client_ip] >= REQUEST_LIMIT:
-            return "请求过于频繁，请稍后再试", 429
-    else:
-        ip_first_request_time[client_ip] = current_time
-    
-    ip_request_count[client_ip] += 1
+    # 优先从预渲染池取，池为空时在请求线程内生成
+    item = math_pool.take()
+    if item is None:
+        item = produce_math_captcha()
+    png_bytes, captcha_text = item
 
-    img, captcha_text = generate_captcha()
     session['captcha'] = captcha_text
     session['captcha_time'] = time.time()  # 记录验证码生成时间
 
-    img_io = io.BytesIO()
-    img.save(img_io, 'PNG')
-    img_io.seek(0)
-
-    return send_file(img_io, mimetype='image/png')
+    return send_file(io.BytesIO(png_bytes), mimetype='image/png')
 
 @math_captcha_bp.route('/verify', methods=['POST'])
 def verify():
+    VERIFIES.inc('math')
     if 'captcha_time' not in session or time.time() - session['captcha_time'] > CAPTCHA_TIMEOUT:
+        EXPIRIES.inc('math')
         return "验证码已过期，请刷新后重试", 403
 
     user_input = request.form.get('captcha', '').lower()
     server_captcha = session.get('captcha', '').lower()
 
     if user_input == server_captcha:
+        SUCCESSES.inc('math')
         session.pop('captcha', None)
         session.pop('captcha_time', None)
         return "验证成功！"
     return "验证失败！"
 
 # 汉字验证码部分
+# 汉字字形图集（首次启动时构建并保存，之后内存映射加载）
+HANZI_ATLAS_PATH = hanzi_atlas_path(HANZI_LIST, HANZI_FONT_SIZE)
+hanzi_atlas = None
+hanzi_atlas_lock = threading.Lock()
+
+def get_hanzi_atlas():
+    """获取汉字字形图集，字体只在构建图集时加载一次"""
+    global hanzi_atlas
+    if hanzi_atlas is None:
+        # 多个请求线程同时首次调用时只构建一次
+        with hanzi_atlas_lock:
+            if hanzi_atlas is None:
+                hanzi_atlas = HanziAtlas.load_or_build(HANZI_ATLAS_PATH, "FZSTK.TTF", HANZI_LIST, HANZI_FONT_SIZE)
+    return hanzi_atlas
+
 def generate_hanzi_list():
     return random.sample(HANZI_LIST, 4)
 
 def generate_captcha_image(hanzi_list):
+    clock = STAGE_SECONDS.stages('word')
     img = Image.new('RGB', (HANZI_IMG_WIDTH, HANZI_IMG_HEIGHT), color=(255, 255, 255))
     draw = ImageDraw.Draw(img)
 
     for _ in range(HANZI_NOISE_POINTS):
         draw.point([random.randint(0, HANZI_IMG_WIDTH), random.randint(0, HANZI_IMG_HEIGHT)],
                    fill=(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)))
+    clock.lap('noise')
 
     shuffled_hanzi_list = hanzi_list.copy()
     random.shuffle(shuffled_hanzi_list)
 
+    atlas = get_hanzi_atlas()
     positions = []
     for i, hanzi in enumerate(shuffled_hanzi_list):
         x = random.randint(50 + i * 80, 100 + i * 80)
         y = random.randint(50, HANZI_IMG_HEIGHT - 50)
         positions.append((x, y))
 
-        char_img = Image.new('RGB', (HANZI_FONT_SIZE, HANZI_FONT_SIZE), color=(255, 255, 255))
-        char_draw = ImageDraw.Draw(char_img)
-        char_draw.text((0, 0), hanzi, fill=(0, 0, 0), font=ImageFont.truetype("FZSTK.TTF", HANZI_FONT_SIZE))
+        char_img = atlas.image(hanzi)
 
         distortion = random.uniform(-0.1, 0.1)
         matrix = (1, distortion, 0, distortion, 1, 0)
         char_img = char_img.transform((HANZI_FONT_SIZE, HANZI_FONT_SIZE), Image.AFFINE, matrix, Image.BICUBIC)
 
         img.paste(char_img, (x, y))
+    clock.lap('text')
 
     for _ in range(7):
         start_x = random.randint(0, HANZI_IMG_WIDTH)
@@ -525,6 +594,7 @@ def generate_captcha_image(hanzi_list):
         end_x = random.randint(center_x - 50, center_x + 50)
         end_y = random.randint(center_y - 50, center_y + 50)
         draw.line((start_x, start_y, end_x, end_y), fill=(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)))
+    clock.lap('lines')
 
     return img, shuffled_hanzi_list, positions
 
@@ -771,9 +841,12 @@ def index():
     """
 
 @word_captcha_bp.route('/captcha')
+@rate_limit(rate_limiter, 'word', WORD_REQUEST_LIMIT, TIME_WINDOW)
 def get_captcha():
-    hanzi_list = generate_hanzi_list()
-    img, shuffled_hanzi_list, positions = generate_captcha_image(hanzi_list)
+    item = word_pool.take()
+    if item is None:
+        item = produce_word_captcha()
+    png_bytes, hanzi_list, shuffled_hanzi_list, positions = item
 
     session['captcha'] = {
         'hanzi_list': hanzi_list,
@@ -782,12 +855,8 @@ def get_captcha():
         'start_time': time.time()
     }
 
-    img_io = io.BytesIO()
-    img.save(img_io, 'PNG')
-    img_io.seek(0)
-
     return jsonify({
-        "image": "data:image/png;base64," + base64.b64encode(img_io.getvalue()).decode('utf-8'),
+        "image": "data:image/png;base64," + base64.b64encode(png_bytes).decode('utf-8'),
         "prompt": " ".join(hanzi_list)
     })
 
@@ -797,19 +866,33 @@ def verify():
     mouse_trace = request.json.get('mouse_trace', [])
     operation_time = request.json.get('operation_time', 0)
 
+    # 轨迹只看点数；紧凑格式直接解码为数组
+    if 'mouse_trace_b64' in request.json:
+        try:
+            trace_length = len(decode_track(request.json['mouse_trace_b64'], 2, TRACK_MAX_POINTS, TRACK_MAX_BYTES))
+        except ValueError:
+            return jsonify({"status": "failure", "message": "轨迹格式错误"}), 400
+    else:
+        trace_length = len(mouse_trace)
+        if trace_length > TRACK_MAX_POINTS:
+            return jsonify({"status": "failure", "message": "轨迹格式错误"}), 400
+
+    VERIFIES.inc('word')
     captcha_info = session.get('captcha', {})
     hanzi_list = captcha_info.get('hanzi_list', [])
     start_time = captcha_info.get('start_time', 0)
 
     if time.time() - start_time > TIMEOUT:
+        EXPIRIES.inc('word')
         session.pop('captcha', None)
         return jsonify({"status": "timeout", "message": "验证超时"})
 
-    if len(mouse_trace) < 3 or operation_time < 1:
+    if trace_length < 3 or operation_time < 1:
         session.pop('captcha', None)
         return jsonify({"status": "failure", "message": "验证失败，可能是机器操作"})
 
     if user_clicks == hanzi_list:
+        SUCCESSES.inc('word')
         session.pop('captcha', None)
         return jsonify({"status": "success", "message": "验证成功"})
     else:
@@ -837,9 +920,10 @@ def check_click():
     return jsonify({"status": "failure"})
 
 # 滑块验证码部分
-verification_data = {}
 captcha_generator = CaptchaGenerator()
-track_analyzer = TrackAnalyzer()
+track_analyzer = TrackAnalyzer(max_speed=2000)
+# 存储验证信息（定长存储，只保存参数记录，图片在获取时按参数渲染）
+verification_data = VerificationStore(VERIFY_CAPACITY, captcha_generator.expire_time, SlideEntry)
 
 HTML_TEMPLATE = '''<!DOCTYPE html>
 <html lang="zh-CN">
@@ -1236,101 +1320,451 @@ def index():
     return HTML_TEMPLATE
 
 @slide_captcha_bp.route('/get_captcha')
+@rate_limit(rate_limiter, 'slide', SLIDE_REQUEST_LIMIT, TIME_WINDOW)
 def get_captcha():
     """获取新的验证码"""
-    # 生成验证码
-    captcha_data = captcha_generator.generate()
-    
-    # 生成验证ID
-    verify_id = str(random.randint(100000, 999999))
+    # 生成验证码参数（只是几个随机数，图片在获取时才渲染，无需预生成）
+    try:
+        params = captcha_generator.generate_params()
+    except LookupError:
+        return 'No background available', 503
     
-    # 存储验证信息
-    verification_data[verify_id] = {
-        'bg_image': captcha_data['bg_image'],
-        'gap_image': captcha_data['gap_image'],
-        'gap_x': captcha_data['gap_x'],
-        'gap_y': captcha_data['gap_y'],
-        'trap_x': captcha_data['trap_x'],
-        'trap_y': captcha_data['trap_y'],
-        'start_time': time.time(),
-        'expire_time': captcha_data['expire_time']
-    }
+    # 分配验证ID并存储验证信息（只保存参数记录）
+    verify_id, _ = verification_data.allocate(params)
     
     return jsonify({
         'verify_id': verify_id,
-        'gap_x': captcha_data['gap_x'],
-        'gap_y': captcha_data['gap_y'],
-        'trap_x': captcha_data['trap_x'],
-        'trap_y': captcha_data['trap_y'],
-        'gap_width': captcha_data['gap_width'],
-        'gap_height': captcha_data['gap_height'],
-        'expire_time': captcha_data['expire_time']
+        'gap_x': params.gap_x,
+        'gap_y': params.gap_y,
+        'trap_x': params.trap_x,
+        'trap_y': params.trap_y,
+        'gap_width': captcha_generator.gap_width,
+        'gap_height': captcha_generator.gap_height,
+        'expire_time': captcha_generator.expire_time
     })
 
-@slide_captcha_bp.route('/bg_image/<verify_id>')
+def send_slide_image(verify_id, kind):
+    """发送背景图或缺口图：每张图最多编码一次，支持 ETag 条件请求"""
+    entry = verification_data.get(verify_id)
+    if entry is None:
+        return 'Invalid verify_id', 400
+
+    remaining = entry.start_time + captcha_generator.expire_time - time.time()
+    if remaining <= 0:
+        # 过期的验证信息立即释放
+        EXPIRIES.inc('slide')
+        verification_data.free(verify_id)
+        return 'Invalid verify_id', 400
+
+    # 图片由参数和背景内容确定性渲染，两者都相同则字节相同，可作为强 ETag
+    bg_tag = captcha_generator.bg_cache.tag(entry.params.bg_index)
+    if bg_tag is None:
+        # 背景在验证码有效期内被移除，该验证码已无法显示
+        verification_data.free(verify_id)
+        return 'Background unavailable', 410
+    etag = f'{kind}-{verify_id}-{entry.params.seed:08x}-{bg_tag}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        attr = f'{kind}_png'
+        png_bytes = getattr(entry, attr)
+        if png_bytes is None:
+            try:
+                png_bytes = render('slide', render_slide_image, entry.params, kind)
+            except LookupError:
+                # 背景在验证码有效期内被移除，该验证码已无法显示
+                verification_data.free(verify_id)
+                return 'Background unavailable', 410
+            # 编码期间记录可能已被释放并复用，确认仍属于该验证ID再缓存
+            if verification_data.get(verify_id) is entry:
+                setattr(entry, attr, png_bytes)
+        response = Response(png_bytes, mimetype='image/png')
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = int(remaining)
+    return response
+
+@slide_captcha_bp.route('/bg_image/<verify_id>', methods=['GET', 'HEAD'])
+@rate_limit(rate_limiter, 'slide_image', SLIDE_IMAGE_REQUEST_LIMIT, TIME_WINDOW)
 def get_bg_image(verify_id):
     """获取背景图片"""
-    if verify_id in verification_data:
-        bg_byte_io = io.BytesIO()
-        verification_data[verify_id]['bg_image'].save(bg_byte_io, format='PNG')
-        bg_byte_io.seek(0)
-        return send_file(bg_byte_io, mimetype='image/png')
-    return 'Invalid verify_id', 400
-
-@slide_captcha_bp.route('/gap_image/<verify_id>')
+    return send_slide_image(verify_id, 'bg')
+
+@slide_captcha_bp.route('/gap_image/<verify_id>', methods=['GET', 'HEAD'])
+@rate_limit(rate_limiter, 'slide_image', SLIDE_IMAGE_REQUEST_LIMIT, TIME_WINDOW)
 def get_gap_image(verify_id):
     """获取缺口图片"""
-    if verify_id in verification_data:
-        gap_byte_io = io.BytesIO()
-        verification_data[verify_id]['gap_image'].save(gap_byte_io, format='PNG')
-        gap_byte_io.seek(0)
-        return send_file(gap_byte_io, mimetype='image/png')
-    return 'Invalid verify_id', 400
+    return send_slide_image(verify_id, 'gap')
 
 @slide_captcha_bp.route('/verify', methods=['POST'])
 def verify():
     """验证滑块位置"""
+    VERIFIES.inc('slide')
     data = request.json
     verify_id = data.get('verify_id')
     x = data.get('x')
     tracks = data.get('mouse_tracks', [])
     
-    if not verify_id or verify_id not in verification_data:
+    verify_data = verification_data.get(verify_id) if verify_id else None
+    if verify_data is None:
         return jsonify({'success': False, 'message': '验证失败，请重试'})
     
-    verify_data = verification_data[verify_id]
+    params = verify_data.params
     
     # 检查是否过期
-    elapsed_time = time.time() - verify_data['start_time']
-    if elapsed_time > verify_data['expire_time']:
-        del verification_data[verify_id]
+    elapsed_time = time.time() - verify_data.start_time
+    if elapsed_time > captcha_generator.expire_time:
+        EXPIRIES.inc('slide')
+        verification_data.free(verify_id)
         return jsonify({'success': False, 'message': '验证码已过期'})
     
-    # 分析轨迹
-    is_valid_track, _ = track_analyzer.analyze_tracks(tracks)
+    # 分析轨迹：紧凑格式直接解码为数组；两种格式的点数上限相同，超过时拒绝，每个点都参与分析
+    if 'mouse_tracks_b64' in data:
+        try:
+            points = decode_track(data['mouse_tracks_b64'], 3, TRACK_MAX_POINTS, TRACK_MAX_BYTES)
+        except ValueError:
+            return jsonify({'success': False, 'message': '轨迹格式错误'}), 400
+        points = points.astype(np.float64)
+        is_valid_track, _ = track_analyzer.analyze_arrays(points[:, 0], points[:, 1], points[:, 2])
+    else:
+        if len(tracks) > TRACK_MAX_POINTS:
+            return jsonify({'success': False, 'message': '轨迹格式错误'}), 400
+        is_valid_track, _ = track_analyzer.analyze_tracks(tracks)
     if not is_valid_track:
         return jsonify({
             'success': False, 
             'message': '出现异常行为'
         })
     
+    return check_slide_position(verify_id, params, x)
+
+def check_slide_position(verify_id, params, x):
+    """检查松开位置：避开陷阱缺口并对准真实缺口"""
     # 检查是否点击了陷阱缺口
-    trap_distance = abs(x - verify_data['trap_x'])
+    trap_distance = abs(x - params.trap_x)
     if trap_distance <= 10:
         return jsonify({'success': False, 'message': '验证失败，请重试'})
     
     # 验证位置（允许10像素的误差）
-    if abs(x - verify_data['gap_x']) <= 5:
+    if abs(x - params.gap_x) <= 5:
         # 验证成功后删除验证数据
-        del verification_data[verify_id]
+        SUCCESSES.inc('slide')
+        verification_data.free(verify_id)
         return jsonify({'success': True, 'message': '验证成功'})
     
     return jsonify({'success': False, 'message': '验证失败，请重试'})
 
+def read_stream_lines(stream):
+    """逐行读取请求体，超出大小限制时返回 413"""
+    received = 0
+    while True:
+        line = stream.readline(STREAM_MAX_LINE + 1)
+        if not line:
+            return
+        received += len(line)
+        if received > STREAM_MAX_BYTES or len(line) > STREAM_MAX_LINE:
+            raise RequestEntityTooLarge()
+        line = line.strip()
+        if line:
+            yield line
+
+@slide_captcha_bp.route('/verify_stream', methods=['POST'])
+def verify_stream():
+    """分块上传轨迹并验证：verify_id 放在查询参数中，请求体为 NDJSON
+
+    每行是一块轨迹点（[{x, y, timestamp}, ...] 或单个点），最后一行 {"x": 松开位置}。
+    边读边分析，轨迹触发硬性限制（速度、偏移、时长）时立即返回，不再读取剩余请求体。
+    """
+    VERIFIES.inc('slide')
+    verify_id = request.args.get('verify_id')
+    verify_data = verification_data.get(verify_id) if verify_id else None
+    if verify_data is None:
+        return jsonify({'success': False, 'message': '验证失败，请重试'})
+
+    params = verify_data.params
+
+    # 检查是否过期
+    elapsed_time = time.time() - verify_data.start_time
+    if elapsed_time > captcha_generator.expire_time:
+        EXPIRIES.inc('slide')
+        verification_data.free(verify_id)
+        return jsonify({'success': False, 'message': '验证码已过期'})
+
+    # 分块分析轨迹
+    analyzer = IncrementalTrackAnalyzer(track_analyzer)
+    x = None
+    try:
+        for line in read_stream_lines(request.stream):
+            item = json.loads(line)
+            if isinstance(item, dict) and 'timestamp' not in item:
+                x = item.get('x')
+                break
+            points = item if isinstance(item, list) else [item]
+            if analyzer.count + len(points) > STREAM_MAX_POINTS:
+                raise RequestEntityTooLarge()
+            if not analyzer.feed(points):
+                break
+    except (ValueError, TypeError, KeyError):
+        return jsonify({'success': False, 'message': '轨迹格式错误'}), 400
+
+    is_valid_track, _ = analyzer.finish()
+    if not is_valid_track:
+        return jsonify({
+            'success': False,
+            'message': '出现异常行为'
+        })
+
+    if isinstance(x, bool) or not isinstance(x, (int, float)):
+        return jsonify({'success': False, 'message': '验证失败，请重试'})
+    return check_slide_position(verify_id, params, x)
+
+# 渲染进程池：以下 render_* 函数在子进程中执行（RENDER_PROCESSES 为 0 时在当前线程执行），
+# 只返回编码后的字节和答案数据；子进程内记录的阶段耗时不会出现在本进程的 /metrics 中
+def render_math_captcha():
+    """生成一个数学验证码，返回PNG字节和答案"""
+    img, result = generate_captcha()
+    with STAGE_SECONDS.time('math', 'encode'):
+        img_io = io.BytesIO()
+        img.save(img_io, 'PNG')
+    return img_io.getvalue(), result
+
+def render_word_captcha():
+    """生成一个汉字验证码，返回PNG字节、汉字列表和位置"""
+    hanzi_list = generate_hanzi_list()
+    img, shuffled_hanzi_list, positions = generate_captcha_image(hanzi_list)
+    with STAGE_SECONDS.time('word', 'encode'):
+        img_io = io.BytesIO()
+        img.save(img_io, 'PNG')
+    return img_io.getvalue(), hanzi_list, shuffled_hanzi_list, positions
+
+def render_slide_image(params, kind):
+    """按参数渲染并编码滑块背景图或缺口图，返回PNG字节"""
+    clock = STAGE_SECONDS.stages('slide')
+    if kind == 'bg':
+        image = captcha_generator.render_bg_image(params)
+    else:
+        image = captcha_generator.render_gap_image(params)
+    clock.lap(f'render_{kind}')
+    image_io = io.BytesIO()
+    image.save(image_io, format='PNG')
+    clock.lap('encode')
+    return image_io.getvalue()
+
+def warm_render_caches():
+    """渲染进程启动时预加载背景图和汉字图集"""
+    captcha_generator.bg_cache.start()
+    get_hanzi_atlas()
+
+render_executor = RenderExecutor(RENDER_PROCESSES, warm_render_caches)
+
+def render(kind, func, *args):
+    """通过渲染进程池执行 func(*args)，记录耗时和执行方式"""
+    start = time.perf_counter()
+    result, mode = render_executor.run(func, *args)
+    RENDER_SECONDS.observe(time.perf_counter() - start, kind, mode)
+    RENDERS.inc(kind)
+    return result
+
+# 预渲染验证码池
+def produce_math_captcha():
+    return render('math', render_math_captcha)
+
+def produce_word_captcha():
+    return render('word', render_word_captcha)
+
+# 使用渲染进程时，每个子进程对应一个补充线程
+POOL_WORKERS = max(1, RENDER_PROCESSES)
+math_pool = CaptchaPool('math', produce_math_captcha, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_REFILL_HORIZON,
+                        workers=POOL_WORKERS)
+word_pool = CaptchaPool('word', produce_word_captcha, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_REFILL_HORIZON,
+                        workers=POOL_WORKERS)
+captcha_pools = {'math': math_pool, 'word': word_pool}
+
+@app.route('/ready')
+def ready():
+    """就绪检查：只报告各验证码池的状态（补充线程在启动时创建，探测不会启动它们）
+
+    池状态为 not_started 说明本 worker 没有调用 start_background_work()，等待不会就绪；
+    filling 说明补充线程已启动、池暂时为空。
+    """
+    pools = {name: pool.stats() for name, pool in captcha_pools.items()}
+    is_ready = all(stats['state'] == 'ready' for stats in pools.values())
+    return jsonify({'ready': is_ready, 'pools': pools}), 200 if is_ready else 503
+
+# 请求耗时和响应状态
+@app.before_request
+def start_request_timer():
+    request_ctx.request_start = time.perf_counter()
+    profiler.request_started(request.endpoint or request.path)
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    start = request_ctx.get('request_start')
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+    RESPONSES.inc(endpoint, response.status_code)
+    if response.status_code == 429:
+        RATE_LIMITED.inc(endpoint)
+    return response
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profiler.request_finished()
+
+# 抓取时读取的存储、限流表和缓存状态（累计次数按计数器类型输出）
+metrics.gauge('captcha_verification_entries', '滑块验证信息存储占用', (),
+              lambda: len(verification_data))
+metrics.gauge('captcha_verification_capacity', '滑块验证信息存储容量', (),
+              lambda: verification_data.capacity)
+metrics.counter('captcha_verification_events', '滑块验证信息存储累计事件数（allocated/freed/expired/evicted）', ('event',),
+              lambda: {(event,): value for event, value in verification_data.stats().items()
+                       if event in ('allocated', 'freed', 'expired', 'evicted')})
+metrics.gauge('captcha_rate_limit_slots', '限流表槽位（total 为容量，active 为未过期的客户端）', ('state',),
+              lambda: {('total',): rate_limiter.slots, ('active',): rate_limiter.stats()['active']})
+metrics.counter('captcha_rate_limit_evictions', '限流表在本进程中的淘汰次数', (),
+              lambda: rate_limiter.evictions)
+metrics.gauge('captcha_pool_size', '预渲染池当前大小', ('pool',),
+              lambda: {(name,): pool.stats()['size'] for name, pool in captcha_pools.items()})
+metrics.gauge('captcha_pool_target', '预渲染池目标大小', ('pool',),
+              lambda: {(name,): pool.stats()['target'] for name, pool in captcha_pools.items()})
+metrics.gauge('captcha_render_queue_depth', '渲染进程池中已提交、尚未返回的任务数', (),
+              lambda: render_executor.pending)
+metrics.gauge('captcha_render_processes', '渲染进程数（0 表示在当前线程渲染）', (),
+              lambda: render_executor.stats()['processes'])
+metrics.counter('captcha_render_jobs', '渲染任务累计数（completed 为子进程完成，inline 含 fallbacks）', ('result',),
+              lambda: {(key,): value for key, value in render_executor.stats().items()
+                       if key in ('submitted', 'completed', 'inline', 'fallbacks', 'errors')})
+metrics.gauge('captcha_background_images', '已缓存的滑块背景图数量', (),
+              lambda: captcha_generator.bg_cache.stats()['images'])
+metrics.gauge('captcha_background_bytes', '已缓存的滑块背景图字节数', (),
+              lambda: captcha_generator.bg_cache.stats()['bytes'])
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus 文本格式的监控指标"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# 采样分析（管理接口，设置 CAPTCHA_ADMIN_TOKEN 后启用，请求头 X-Admin-Token 携带令牌）
+ADMIN_TOKEN = os.environ.get('CAPTCHA_ADMIN_TOKEN', '')
+PROFILE_MAX_SECONDS = 60
+profiler = SamplingProfiler()
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+@admin_bp.before_request
+def check_admin_token():
+    if not ADMIN_TOKEN:
+        return 'Not Found', 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return 'Forbidden', 403
+
+def admin_float_arg(name, default, low, high):
+    """读取查询参数并限制在 [low, high] 内"""
+    try:
+        value = float(request.args.get(name, default))
+    except ValueError:
+        value = default
+    return min(max(value, low), high)
+
+@admin_bp.route('/bg_cache_stats')
+def admin_bg_cache_stats():
+    """获取背景图缓存统计"""
+    return jsonify(captcha_generator.bg_cache.stats())
+
+@admin_bp.route('/store_stats')
+def admin_store_stats():
+    """获取验证信息存储的占用和淘汰统计"""
+    return jsonify(verification_data.stats())
+
+@admin_bp.route('/profile')
+def admin_profile():
+    """采样 seconds 秒内所有请求线程的调用栈，返回 collapsed stack 文本（可直接生成火焰图）"""
+    seconds = admin_float_arg('seconds', 5, 0.1, PROFILE_MAX_SECONDS)
+    interval = admin_float_arg('interval_ms', 5, 1, 1000) / 1000
+    stacks, ticks = profiler.profile(seconds, interval)
+    response = Response(collapse(stacks), mimetype='text/plain; charset=utf-8')
+    response.headers['X-Profile-Ticks'] = str(ticks)
+    return response
+
+@admin_bp.route('/slow_requests', methods=['GET'])
+def admin_slow_requests():
+    """保留的最慢请求及其调用栈；index 指定时只返回该请求的 collapsed stack 文本"""
+    profiles = profiler.slow_profiles()
+    index = request.args.get('index', type=int)
+    if index is not None:
+        if not 0 <= index < len(profiles):
+            return 'Not Found', 404
+        return Response(collapse(profiles[index]['stacks']), mimetype='text/plain; charset=utf-8')
+    threshold = profiler.slow_threshold
+    return jsonify({
+        'enabled': threshold is not None,
+        'threshold_ms': threshold * 1000 if threshold is not None else None,
+        'keep': profiler.slow_keep,
+        'profiles': [{key: value for key, value in profile.items() if key != 'stacks'}
+                     | {'top': collapse(profile['stacks']).splitlines()[:10]} for profile in profiles],
+    })
+
+@admin_bp.route('/slow_requests', methods=['POST'])
+def admin_slow_requests_config():
+    """开启（threshold_ms、keep、interval_ms）或关闭（enabled=0）慢请求模式"""
+    if request.args.get('enabled') == '0':
+        profiler.stop_slow_mode()
+    else:
+        profiler.start_slow_mode(admin_float_arg('threshold_ms', 200, 1, 60000) / 1000,
+                                 int(admin_float_arg('keep', 20, 1, 1000)),
+                                 admin_float_arg('interval_ms', 5, 1, 1000) / 1000)
+    return admin_slow_requests()
+
+# 压测用测试钩子（CAPTCHA_TEST_HOOKS=1 时启用，生产环境不要打开）
+TEST_HOOKS = os.environ.get('CAPTCHA_TEST_HOOKS') == '1'
+test_hooks_bp = Blueprint('test_hooks', __name__, url_prefix='/test')
+
+@test_hooks_bp.route('/answer/<kind>')
+def test_answer(kind):
+    """返回当前会话（或 verify_id 对应）验证码的答案，供压测脚本完成验证"""
+    if kind == 'math':
+        return jsonify({'answer': session.get('captcha')})
+    if kind == 'word':
+        return jsonify({'answer': session.get('captcha', {}).get('hanzi_list')})
+    if kind == 'slide':
+        entry = verification_data.get(request.args.get('verify_id'))
+        return jsonify({'answer': entry.params.gap_x if entry is not None else None})
+    return 'Unknown captcha type', 404
+
+def use_test_client_address(wsgi_app):
+    """用 X-Test-Client 请求头代替客户端IP，压测时每个虚拟客户端单独限流"""
+    def middleware(environ, start_response):
+        client = environ.get('HTTP_X_TEST_CLIENT')
+        if client:
+            environ['REMOTE_ADDR'] = client
+        return wsgi_app(environ, start_response)
+    return middleware
+
 # 注册蓝图
 app.register_blueprint(math_captcha_bp)
 app.register_blueprint(word_captcha_bp)
 app.register_blueprint(slide_captcha_bp)
+app.register_blueprint(admin_bp)
+if TEST_HOOKS:
+    app.register_blueprint(test_hooks_bp)
+    app.wsgi_app = use_test_client_address(app.wsgi_app)
+
+def start_background_work():
+    """启动本进程的后台工作：先创建渲染进程（fork 时只有调用线程），再启动预渲染池的补充线程
+
+    每个 worker 进程在处理请求之前、创建其他线程之前调用一次：python 3in1.py 和 asgi.py 已经调用，
+    gunicorn 等 WSGI 服务器由 worker 初始化钩子调用（见 gunicorn.conf.py）。
+    """
+    render_executor.start()
+    for pool in captcha_pools.values():
+        pool.start()
+
+def stop_background_work():
+    for pool in captcha_pools.values():
+        pool.stop()
+    render_executor.shutdown()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    start_background_work()
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
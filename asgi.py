@@ -0,0 +1,169 @@
+"""三合一验证码的 ASGI 入口：uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+请求体在事件循环中异步读取，读完后才交给线程池中的 Flask 处理；响应体也在事件循环中异步发送。
+慢速上传轨迹或下载图片的连接、空闲的长连接只占一个协程，不占线程。
+CPU 密集的渲染另见 CAPTCHA_RENDER_PROCESSES（渲染进程池）。
+"""
+import asyncio
+import importlib
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+WSGI_THREADS = int(os.environ.get('CAPTCHA_WSGI_THREADS', 16))  # 执行 Flask 视图的线程数
+
+captcha = importlib.import_module('3in1')
+
+
+class WsgiToAsgi:
+    """把 WSGI 应用包装为 ASGI 应用：缓冲整个请求体后在线程池中调用，缓冲整个响应体后异步发送
+
+    请求体超过 max_body 时不再读取，直接返回 413。分块上传接口（/slide/verify_stream）在这里
+    也是读完整个请求体后才开始分析，逐块提前拒绝只在 WSGI 模式下生效。
+    on_startup 在事件循环线程中同步调用：此时还没有处理过请求，线程池尚未创建任何线程，
+    可以安全地 fork 渲染进程；失败时回复 lifespan.startup.failed，服务器不会开始接受请求。
+    """
+
+    def __init__(self, wsgi_app, executor, max_body=None, on_startup=None, on_shutdown=None):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+        self.max_body = max_body
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if self.on_startup is not None:
+                        self.on_startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': f'{type(e).__name__}: {e}'})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                try:
+                    if self.on_shutdown is not None:
+                        self.on_shutdown()
+                except Exception as e:
+                    await send({'type': 'lifespan.shutdown.failed', 'message': f'{type(e).__name__}: {e}'})
+                    return
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, scope, receive):
+        """读取完整请求体；超过上限返回 None，客户端断开时抛出 ConnectionError"""
+        declared = _header(scope, b'content-length')
+        if self.max_body is not None and declared is not None and declared.isdigit() \
+                and int(declared) > self.max_body:
+            return None
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ConnectionError('客户端已断开')
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body is not None and size > self.max_body:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def _http(self, scope, receive, send):
+        try:
+            body = await self._read_body(scope, receive)
+        except ConnectionError:
+            return
+        if body is None:
+            await _send_response(send, 413, [(b'content-type', b'text/plain; charset=utf-8'),
+                                             (b'connection', b'close')], [b'Request Entity Too Large'])
+            return
+
+        environ = build_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        status, headers, chunks = await loop.run_in_executor(self.executor, self._call_wsgi, environ)
+        await _send_response(send, status, headers, chunks)
+
+    def _call_wsgi(self, environ):
+        """在线程池中调用 WSGI 应用，返回 (状态码, 响应头, 响应体分块)"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return lambda data: chunks.append(data)
+
+        chunks = []
+        result = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    chunks.append(chunk)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def _send_response(send, status, headers, chunks):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    for chunk in chunks[:-1]:
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': chunks[-1] if chunks else b''})
+
+
+def build_environ(scope, body):
+    """按 PEP 3333 由 ASGI scope 构造 WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        # 重复的请求头按 RFC 7230 用逗号合并
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+# 启动钩子在事件循环线程中调用 captcha.start_background_work，此时进程中只有事件循环线程
+app = WsgiToAsgi(captcha.app, ThreadPoolExecutor(WSGI_THREADS, thread_name_prefix='wsgi'),
+                 captcha.app.config['MAX_CONTENT_LENGTH'], captcha.start_background_work, captcha.stop_background_work)
@@ -0,0 +1,349 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# 背景资源包格式：文件头 + JSON 索引 + 连续存放的 RGBA 原始数组
+PACK_MAGIC = b'BGPK'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<4sHHHII')  # 魔数、版本、宽、高、图片数、索引长度
+PACK_ALIGN = 64
+
+
+class BackgroundCache:
+    """滑块背景图缓存：所有背景一次性解码并缩放为 RGBA 数组，后台线程监视目录变化"""
+
+    def __init__(self, bg_dir, size, watch_interval=2.0, extensions=('.png', '.jpg', '.jpeg'), pack_path=None):
+        self.bg_dir = bg_dir                  # 背景图片目录
+        self.pack_path = pack_path            # 背景资源包，存在时只从资源包加载
+        self.size = size                      # 缩放后的尺寸 (宽, 高)
+        self.watch_interval = watch_interval  # 目录检查间隔（秒）
+        self.extensions = extensions
+
+        self._lock = threading.Lock()
+        self._files = {}     # 文件名 -> (修改时间, 文件大小, RGBA 数组)
+        self._pack = None    # 当前使用的资源包内存映射
+        self.source = None   # 'pack' 或 'dir'
+        self._arrays = ()    # 供请求线程读取的不可变快照
+        self._ids = ()       # 与 _arrays 对应的背景编号
+        self._images = {}    # 背景编号 -> RGBA 数组
+        self._tags = {}      # 背景编号 -> 内容标识的短摘要，用于 ETag
+        self._key_ids = {}   # 背景内容标识 -> 背景编号，未变化的背景重新加载后编号不变
+        self._next_id = 0
+        self._signature = None
+        self._bad_signature = None  # 最近一次加载失败的资源包，未变化时不再重复加载和计数
+        self._pid = None
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.load_errors = 0
+        self.last_error = None
+        self.last_reload_time = None
+        self.last_reload_seconds = 0.0
+
+    def start(self):
+        """首次使用时加载并启动目录监视线程（fork 后在新进程中重新启动）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        self.reload()
+        thread = threading.Thread(target=self._watch, name='bg-cache-watch', daemon=True)
+        thread.start()
+
+    def _scan(self):
+        """列出目录中的背景文件及其修改时间和大小"""
+        entries = {}
+        try:
+            with os.scandir(self.bg_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(self.extensions):
+                        stat = entry.stat()
+                        entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _load(self, name):
+        """解码并缩放单张背景图"""
+        with Image.open(os.path.join(self.bg_dir, name)) as img:
+            img = img.convert('RGBA').resize(self.size)
+        array = np.asarray(img)
+        array.flags.writeable = False
+        return array
+
+    def reload(self):
+        """重新加载背景：存在资源包（或曾经使用过资源包）时只使用资源包，否则增量扫描背景目录"""
+        if self.pack_path and (self.source == 'pack' or os.path.exists(self.pack_path)):
+            return self._reload_pack()
+        return self._reload_dir()
+
+    def _reload_pack(self):
+        """资源包变化时重新映射，不再读取原图；资源包无效时也不退回原图"""
+        start = time.perf_counter()
+        try:
+            stat = os.stat(self.pack_path)
+            signature = ('pack', stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = ('pack', None, None)
+        with self._lock:
+            if signature in (self._signature, self._bad_signature):
+                return False
+            try:
+                pack = BackgroundPack(self.pack_path)
+            except (OSError, ValueError) as e:
+                return self._pack_failed(signature, f'无法加载背景资源包: {e}')
+            if pack.size != tuple(self.size):
+                pack.close()
+                return self._pack_failed(signature, f'背景资源包尺寸 {pack.size} 与 {tuple(self.size)} 不符')
+            # 旧的内存映射仍可能被请求线程中的数组引用，交给垃圾回收释放
+            self._pack = pack
+            self._files = {}
+            keys = [('pack', entry['sha1']) for entry in pack.index]
+            self._publish(keys, pack.arrays)
+            self._mark_reloaded(signature, 'pack', start)
+        return True
+
+    def _pack_failed(self, signature, error):
+        """资源包无效：继续使用已映射的旧包（没有时不提供背景），同一个坏包只计一次错误"""
+        self._bad_signature = signature
+        self.load_errors += 1
+        self.last_error = error
+        if self.source != 'pack':
+            self._pack = None
+            self._files = {}
+            self._publish([], [])
+            self.source = 'pack'
+        return False
+
+    def _publish(self, keys, arrays):
+        """为每张背景分配稳定编号并替换快照；已移除背景的标识随之丢弃，编号不再复用"""
+        key_ids = {}
+        for key in keys:
+            if key not in key_ids:
+                key_ids[key] = self._key_ids.get(key)
+                if key_ids[key] is None:
+                    key_ids[key] = self._next_id
+                    self._next_id += 1
+        self._key_ids = key_ids
+        ids = [key_ids[key] for key in keys]
+        self._images = dict(zip(ids, arrays))
+        self._tags = {key_ids[key]: hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:12] for key in keys}
+        self._ids = tuple(ids)
+        self._arrays = tuple(arrays)
+
+    def _mark_reloaded(self, signature, source, start):
+        self._signature = signature
+        self._bad_signature = None
+        self.last_error = None
+        self.source = source
+        self.reloads += 1
+        self.last_reload_time = time.time()
+        self.last_reload_seconds = time.perf_counter() - start
+
+    def _reload_dir(self):
+        """增量重新加载：只解码新增或修改过的文件，移除已删除的文件"""
+        start = time.perf_counter()
+        scanned = self._scan()
+        signature = frozenset(scanned.items())
+        with self._lock:
+            if signature == self._signature:
+                return False
+            files = {}
+            for name, (mtime, size) in scanned.items():
+                cached = self._files.get(name)
+                if cached is not None and cached[:2] == (mtime, size):
+                    files[name] = cached
+                    continue
+                try:
+                    files[name] = (mtime, size, self._load(name))
+                except (OSError, ValueError):
+                    self.load_errors += 1
+            self._pack = None
+            self._files = files
+            names = sorted(files)
+            self._publish([(name,) + files[name][:2] for name in names], [files[name][2] for name in names])
+            self._mark_reloaded(signature, 'dir', start)
+        return True
+
+    def _watch(self):
+        while self._pid == os.getpid():
+            time.sleep(self.watch_interval)
+            try:
+                self.reload()
+            except Exception:
+                self.load_errors += 1
+
+    def random_index(self, rng=random):
+        """随机返回一张背景的编号，缓存为空时返回 None"""
+        self.start()
+        ids = self._ids
+        if not ids:
+            self.misses += 1
+            return None
+        return rng.choice(ids)
+
+    def image(self, bg_index):
+        """按编号返回背景图，背景已被移除时返回 None（编号不会指向其他背景）"""
+        self.start()
+        array = self._images.get(bg_index)
+        if array is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Image.fromarray(array)
+
+    def tag(self, bg_index):
+        """返回背景内容的短摘要（资源包中的源图 SHA-1 或文件名、修改时间和大小），背景已被移除时返回 None"""
+        return self._tags.get(bg_index)
+
+    def random_image(self):
+        """随机返回一张已缩放的背景图，缓存为空时返回 None"""
+        self.start()
+        arrays = self._arrays
+        if not arrays:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Image.fromarray(random.choice(arrays))
+
+    def stats(self):
+        """返回缓存命中和重新加载统计"""
+        arrays = self._arrays
+        return {
+            'source': self.source,
+            'images': len(arrays),
+            'bytes': sum(array.nbytes for array in arrays),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'load_errors': self.load_errors,
+            'last_error': self.last_error,
+            'last_reload_time': self.last_reload_time,
+            'last_reload_seconds': round(self.last_reload_seconds, 4),
+        }
+
+
+class BackgroundPack:
+    """只读打开背景资源包，图片以内存映射数组的形式提供"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse(path)
+        except Exception:
+            self.arrays = []
+            self._mmap.close()
+            raise
+
+    def _parse(self, path):
+        # 截断或损坏的文件统一报 ValueError，由调用方记为加载失败
+        if len(self._mmap) < PACK_HEADER.size:
+            raise ValueError(f'背景资源包不完整: {path}')
+        magic, version, width, height, count, index_len = PACK_HEADER.unpack_from(self._mmap, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f'不是有效的背景资源包: {path}')
+        data_offset = _align(PACK_HEADER.size + index_len)
+        if data_offset + count * height * width * 4 > len(self._mmap):
+            raise ValueError(f'背景资源包不完整: {path}')
+        self.size = (width, height)
+        self.index = json.loads(self._mmap[PACK_HEADER.size:PACK_HEADER.size + index_len].decode('utf-8'))
+        if (not isinstance(self.index, list) or len(self.index) != count
+                or not all(isinstance(entry, dict) and 'sha1' in entry for entry in self.index)):
+            raise ValueError(f'背景资源包索引无效: {path}')
+        data = np.frombuffer(self._mmap, dtype=np.uint8, count=count * height * width * 4, offset=data_offset)
+        self.arrays = list(data.reshape(count, height, width, 4))
+
+    def close(self):
+        self.arrays = []
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 仍有数组引用映射内存时无法关闭，由垃圾回收处理
+            pass
+
+
+def _align(offset):
+    return (offset + PACK_ALIGN - 1) // PACK_ALIGN * PACK_ALIGN
+
+
+def load_background(path, size):
+    """解码单张源图并缩放为 RGBA 数组
+
+    JPEG 先用 draft 模式让解码器按 DCT 缩放（1/2、1/4、1/8）直接解出接近目标尺寸的图，
+    再按 EXIF 方向摆正并缩放；输出只有像素，元数据全部丢弃。
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', size)
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGBA').resize(size)
+    return np.asarray(img)
+
+
+def write_background_pack(paths, out_path, size):
+    """把一组源图转换为背景资源包，返回写入的索引"""
+    index = []
+    arrays = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        arrays.append(load_background(path, size))
+        index.append({'name': os.path.basename(path), 'sha1': digest})
+
+    index_bytes = json.dumps(index, ensure_ascii=False).encode('utf-8')
+    header = PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, size[0], size[1], len(arrays), len(index_bytes))
+    padding = _align(len(header) + len(index_bytes)) - len(header) - len(index_bytes)
+
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(index_bytes)
+        f.write(b'\0' * padding)
+        for array in arrays:
+            f.write(np.ascontiguousarray(array, dtype=np.uint8).tobytes())
+    # 原子替换，运行中的进程看到的要么是旧包要么是新包
+    os.replace(tmp_path, out_path)
+    return index
+
+
+def main(argv=None):
+    """命令行：python backgrounds.py static -o backgrounds.pack"""
+    parser = argparse.ArgumentParser(description='把背景源图目录转换为滑块验证码背景资源包')
+    parser.add_argument('src_dir', help='源图目录')
+    parser.add_argument('-o', '--output', default='backgrounds.pack', help='输出的资源包路径')
+    parser.add_argument('--width', type=int, default=300, help='背景宽度')
+    parser.add_argument('--height', type=int, default=150, help='背景高度')
+    args = parser.parse_args(argv)
+
+    extensions = ('.png', '.jpg', '.jpeg')
+    paths = sorted(os.path.join(args.src_dir, name) for name in os.listdir(args.src_dir)
+                   if name.lower().endswith(extensions))
+    if not paths:
+        print(f'{args.src_dir} 中没有背景图片', file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    index = write_background_pack(paths, args.output, (args.width, args.height))
+    elapsed = time.perf_counter() - start
+    source_bytes = sum(os.path.getsize(path) for path in paths)
+    print(f'已写入 {args.output}: {len(index)} 张背景, {args.width}x{args.height} RGBA, '
+          f'{os.path.getsize(args.output) / 1024:.0f} KB（源图 {source_bytes / 1024:.0f} KB），耗时 {elapsed:.2f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""连接容量基准：python -m benchmarks.bench_connections [--steps 100,500,1000,2000] [--modes wsgi,asgi]
+
+分别启动当前的 WSGI 服务（python 3in1.py，每个连接一个线程）和 ASGI 服务（uvicorn asgi:app），
+逐级建立 N 个慢速上传连接（发送请求头和部分请求体后停住，模拟上传长轨迹的慢客户端），
+然后用新连接探测一个轻量接口的延迟，并记录服务进程的线程数和常驻内存。
+ASGI 模式需要安装 uvicorn。
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import ROOT
+from benchmarks.loadgen import Connection, read_rss
+
+HOST = '127.0.0.1'
+PROBE_PATH = '/metrics'
+
+
+def server_command(mode, port):
+    if mode == 'wsgi':
+        return [sys.executable, '3in1.py']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', HOST, '--port', str(port),
+            '--log-level', 'warning', '--backlog', '4096']
+
+
+def start_server(mode, port):
+    env = dict(os.environ, PORT=str(port))
+    proc = subprocess.Popen(server_command(mode, port), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'{mode} 服务启动失败，退出码 {proc.returncode}')
+        try:
+            asyncio.run(probe_once(port, 1.0))
+            return proc
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f'等待 {mode} 服务启动超时')
+
+
+def read_threads(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+async def probe_once(port, timeout):
+    conn = Connection(HOST, port)
+    try:
+        start = time.perf_counter()
+        status, _, _ = await asyncio.wait_for(conn.request('GET', PROBE_PATH, {'Connection': 'close'}), timeout)
+        if status != 200:
+            raise OSError(f'状态码 {status}')
+        return time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+async def open_slow_upload(port):
+    """发送请求头和部分请求体后停住"""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    body = b'{"verify_id": "0", "x": 1, "mouse_tracks": ['
+    head = (f'POST /slide/verify HTTP/1.1\r\nHost: {HOST}:{port}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body) + 4096}\r\n\r\n').encode('latin-1')
+    writer.write(head + body)
+    await writer.drain()
+    return writer
+
+
+async def measure_step(port, count, pid, probes, timeout):
+    results = await asyncio.gather(*(open_slow_upload(port) for _ in range(count)), return_exceptions=True)
+    writers = [r for r in results if not isinstance(r, BaseException)]
+    # 等服务端接受连接并读到请求体
+    await asyncio.sleep(1.0)
+
+    latencies, failures = [], 0
+    for _ in range(probes):
+        try:
+            latencies.append(await probe_once(port, timeout))
+        except (OSError, asyncio.TimeoutError):
+            failures += 1
+    row = {
+        'connections': count,
+        'established': len(writers),
+        'threads': read_threads(pid),
+        'rss_mb': read_rss(pid),
+        'probe_p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'probe_max_ms': max(latencies) * 1000 if latencies else None,
+        'probe_failures': failures,
+    }
+    for writer in writers:
+        writer.close()
+    await asyncio.sleep(1.0)
+    return row
+
+
+def print_row(mode, row):
+    p50 = '-' if row['probe_p50_ms'] is None else f'{row["probe_p50_ms"]:.1f}'
+    worst = '-' if row['probe_max_ms'] is None else f'{row["probe_max_ms"]:.1f}'
+    rss = '-' if row['rss_mb'] is None else f'{row["rss_mb"]:.0f}'
+    print(f'{mode:5s} {row["connections"]:6d} {row["established"]:6d} {row["threads"] or "-":>6} {rss:>7s} '
+          f'{p50:>8s} {worst:>8s} {row["probe_failures"]:5d}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WSGI 与 ASGI 服务的连接容量对比')
+    parser.add_argument('--steps', default='100,500,1000,2000', help='慢速连接数（逗号分隔）')
+    parser.add_argument('--modes', default='wsgi,asgi', help='要测试的服务模式')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--probes', type=int, default=20, help='每级探测请求数')
+    parser.add_argument('--timeout', type=float, default=5.0, help='探测请求超时（秒）')
+    args = parser.parse_args()
+
+    print(f'{"模式":5s} {"慢连接":>6s} {"已建立":>6s} {"线程":>6s} {"RSS/MB":>7s} {"p50/ms":>8s} {"max/ms":>8s} {"失败":>5s}')
+    for mode in args.modes.split(','):
+        if mode == 'asgi' and importlib.util.find_spec('uvicorn') is None:
+            print('asgi  跳过：未安装 uvicorn')
+            continue
+        proc = start_server(mode, args.port)
+        try:
+            for count in map(int, args.steps.split(',')):
+                print_row(mode, asyncio.run(measure_step(args.port, count, proc.pid, args.probes, args.timeout)))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""数学验证码字形图集基准：python -m benchmarks.bench_math_glyphs"""
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+from benchmarks.common import load_module, timeit
+
+
+def draw_text_freetype(draw, font, expression):
+    """原实现：每个字符 textbbox/textlength + 两次 draw.text"""
+    bbox = draw.textbbox((0, 0), expression, font=font)
+    x = (300 - (bbox[2] - bbox[0])) // 2
+    y = (100 - (bbox[3] - bbox[1])) // 2
+    for char in expression:
+        char_width = draw.textlength(char, font=font)
+        draw.text((x + 1 + random.randint(-2, 2), y + 1 + random.randint(-1, 1)), char, fill=(180, 180, 180), font=font)
+        draw.text((x + random.randint(-3, 3), y + random.randint(-2, 2)), char,
+                  fill=(random.randint(0, 100), random.randint(0, 100), random.randint(0, 100)), font=font)
+        x += char_width + random.randint(8, 12)
+
+
+def draw_text_atlas(draw, atlas, expression):
+    """图集实现：整段度量查表 + 两次遮罩着色粘贴"""
+    bbox = atlas.textbbox(expression)
+    x = (300 - (bbox[2] - bbox[0])) // 2
+    y = (100 - (bbox[3] - bbox[1])) // 2
+    for char in expression:
+        char_width = atlas.textlength(char)
+        atlas.draw_char(draw, (x + 1 + random.randint(-2, 2), y + 1 + random.randint(-1, 1)), char, (180, 180, 180))
+        atlas.draw_char(draw, (x + random.randint(-3, 3), y + random.randint(-2, 2)), char,
+                        (random.randint(0, 100), random.randint(0, 100), random.randint(0, 100)))
+        x += char_width + random.randint(8, 12)
+
+
+def main():
+    math_captcha = load_module('math.py', 'math_captcha')
+    font = ImageFont.truetype('arial.ttf', math_captcha.FONT_SIZE)
+    atlas = math_captcha.glyph_atlas
+    img = Image.new('RGB', (300, 100), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+
+    random.seed(0)
+    expressions = [math_captcha.generate_math_expression()[0] for _ in range(64)]
+    state = {'i': 0}
+
+    def next_expression():
+        state['i'] = (state['i'] + 1) % len(expressions)
+        return expressions[state['i']]
+
+    freetype = timeit(lambda: draw_text_freetype(draw, font, next_expression()))
+    atlas_time = timeit(lambda: draw_text_atlas(draw, atlas, next_expression()))
+    full = timeit(math_captcha.generate_captcha, number=100)
+
+    print(f'文字绘制（FreeType）: {freetype * 1e6:8.1f} us/图')
+    print(f'文字绘制（图集）    : {atlas_time * 1e6:8.1f} us/图  加速 {freetype / atlas_time:.1f}x')
+    print(f'完整 generate_captcha: {full * 1e6:8.1f} us/图')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""批量 tesseract 基准：python -m benchmarks.bench_ocr_batch [-n 50]
+
+比较逐次调用（每个组合启动一次 tesseract）与批量调用（同一配置的图片用列表文件一次识别）
+每秒识别的验证码数量，分别在逐个执行和线程池并行两种方式下测量，并确认两者的识别结果一致。
+需要本机安装 tesseract（--tesseract 指定路径，默认从 PATH 查找）。
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+from benchmarks.common import add_tesseract_argument, load_attacker, make_math_captchas
+
+
+def timed(func):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='逐次调用与批量调用 tesseract 的吞吐对比')
+    parser.add_argument('-n', '--number', type=int, default=50, help='验证码数量')
+    add_tesseract_argument(parser)
+    args = parser.parse_args()
+    if not args.tesseract:
+        print('未找到 tesseract，请安装或用 --tesseract 指定路径', file=sys.stderr)
+        return 1
+
+    attacker = load_attacker(args.tesseract)
+    images = [img for img, _, _ in make_math_captchas(args.number, png=True)]
+    grid = len(attacker.process_image(images[0])) * len(attacker.OCR_CONFIGS)
+    print(f'{args.number} 张验证码，每张 {grid} 个组合，线程池 {attacker.OCR_WORKERS} 线程')
+
+    for label, executor in (('逐个执行', None), ('线程池', attacker.get_ocr_executor())):
+        per_call, per_call_seconds = timed(
+            lambda: [attacker.recognize_captcha(img, executor=executor) for img in images])
+        batch, batch_seconds = timed(lambda: attacker.recognize_captchas(images, executor=executor))
+        same = '一致' if per_call == batch else '不一致'
+        print(f'{label}: 逐次调用 {args.number / per_call_seconds:7.1f} 张/秒 ({args.number * grid} 次启动)  '
+              f'批量 {args.number / batch_seconds:7.1f} 张/秒  加速 {per_call_seconds / batch_seconds:.1f}x  结果{same}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""OCR 组合并行识别基准：python -m benchmarks.bench_ocr_parallel [-n 10] [--workers 1,2,4,8]
+
+用固定种子生成数学验证码，分别以逐个识别和不同线程数的线程池运行 recognize_captcha，
+比较每张验证码的识别耗时（墙钟时间），并确认各线程数下的投票结果与逐个识别一致。
+需要本机安装 tesseract（--tesseract 指定路径，默认从 PATH 查找）。
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import add_tesseract_argument, load_attacker, make_math_captchas
+
+
+def run(attacker, images, executor):
+    """返回 (识别结果列表, 每张耗时列表)"""
+    results, seconds = [], []
+    for img in images:
+        start = time.perf_counter()
+        # recognize_captcha 会打印候选统计，这里不输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(attacker.recognize_captcha(img, executor=executor))
+        seconds.append(time.perf_counter() - start)
+    return results, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR 组合并行识别基准')
+    parser.add_argument('-n', '--number', type=int, default=10, help='验证码数量')
+    parser.add_argument('--workers', default=f'1,2,4,{os.cpu_count()}', help='线程数（逗号分隔，1 表示逐个识别）')
+    add_tesseract_argument(parser)
+    args = parser.parse_args()
+    if not args.tesseract:
+        print('未找到 tesseract，请安装或用 --tesseract 指定路径', file=sys.stderr)
+        return 1
+
+    attacker = load_attacker(args.tesseract)
+    images = [img for img, _, _ in make_math_captchas(args.number, png=True)]
+    grid = len(attacker.process_image(images[0])) * len(attacker.OCR_CONFIGS)
+    print(f'{args.number} 张验证码，每张 {grid} 次 OCR 调用，CPU 核数 {os.cpu_count()}')
+
+    baseline, seconds = run(attacker, images, None)
+    print(f'{"逐个":>6s} {statistics.median(seconds) * 1000:9.1f} ms/张')
+    for workers in map(int, args.workers.split(',')):
+        if workers <= 1:
+            continue
+        with ThreadPoolExecutor(workers) as executor:
+            results, parallel = run(attacker, images, executor)
+        same = '一致' if results == baseline else '不一致'
+        print(f'{workers:4d}线程 {statistics.median(parallel) * 1000:9.1f} ms/张  '
+              f'加速 {statistics.median(seconds) / statistics.median(parallel):.2f}x  结果与逐个识别{same}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""文字区域裁剪基准：python -m benchmarks.bench_ocr_roi [-n 200]
+
+用固定种子生成数学验证码（已知算式和每个字符的绘制位置），比较整张图片与只取算式区域（OCR_ROI）两种方式：
+交给 tesseract 的像素数、预处理耗时、区域是否完整包含每个字符的字形、模板匹配在裁剪前后的算式准确率，
+以及 tesseract 网格投票的耗时和算式准确率。未找到 tesseract 时只输出前几项。
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import add_tesseract_argument, load_attacker, load_module, make_math_captchas, timeit
+
+
+def make_captchas_with_glyphs(count):
+    """生成验证码并记录每个字符字形（遮罩不为 0 的部分，含抗锯齿边缘）在图中的边界框，返回 [(样本, 边界框列表)]"""
+    atlas = load_module('3in1.py', 'captcha_3in1').glyph_atlas
+    boxes = []
+
+    def draw_char(draw, xy, char, fill):
+        mask, (left, top), _ = atlas.glyph(char)
+        if mask is not None:
+            ys, xs = np.nonzero(np.asarray(mask))
+            x, y = round(xy[0]) + left, round(xy[1]) + top
+            boxes.append((x + xs.min(), y + ys.min(), x + xs.max() + 1, y + ys.max() + 1))
+        return type(atlas).draw_char(atlas, draw, xy, char, fill)
+
+    atlas.draw_char = draw_char
+    try:
+        samples = []
+        for i in range(count):
+            boxes.clear()
+            samples.append((make_math_captchas(1, start=i)[0], list(boxes)))
+        return samples
+    finally:
+        del atlas.draw_char
+
+
+def glyphs_inside(box, glyphs):
+    """所有字符的字形是否都完整落在区域内（只看真实字形，噪点不影响结果）"""
+    if box is None:
+        return False
+    left, top, right, bottom = box
+    return all(left <= x0 and top <= y0 and x1 <= right and y1 <= bottom for x0, y0, x1, y1 in glyphs)
+
+
+def template_accuracy(attacker, recognizer, samples, roi):
+    """模板匹配的算式正确率；roi 为 True 时只识别裁剪出的区域（不放大），用来检查裁剪是否丢失字符"""
+    correct = 0
+    for img, expression, _ in samples:
+        if roi:
+            box = attacker.find_text_roi(img)
+            img = img.crop(box) if box is not None else img
+        correct += recognizer.recognize(img)[0] == expression
+    return correct / len(samples)
+
+
+def run_ocr(attacker, samples, roi):
+    """返回 (算式正确率, 每张耗时中位数 ms)"""
+    attacker.OCR_ROI = roi
+    correct = 0
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for img, expression, _ in samples:
+            start = time.perf_counter()
+            text = attacker.recognize_captcha(img)
+            durations.append(time.perf_counter() - start)
+            correct += text == expression
+    return correct / len(samples), statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='整张图片与裁剪算式区域后 OCR 的对比')
+    parser.add_argument('-n', '--number', type=int, default=200, help='验证码数量')
+    parser.add_argument('--tesseract-number', type=int, default=50, help='tesseract 识别的验证码数量（较慢）')
+    add_tesseract_argument(parser)
+    args = parser.parse_args()
+
+    attacker = load_attacker(args.tesseract)
+    samples_with_glyphs = make_captchas_with_glyphs(args.number)
+    samples = [sample for sample, _ in samples_with_glyphs]
+    images = [img for img, _, _ in samples]
+
+    full_pixels = statistics.mean(img.width * img.height for img in images)
+    roi_pixels = statistics.mean(crop.width * crop.height for crop in map(attacker.crop_text_roi, images))
+    inside = sum(glyphs_inside(attacker.find_text_roi(sample[0]), glyphs)
+                 for sample, glyphs in samples_with_glyphs) / len(samples)
+    print(f'OCR 输入: 整张 {full_pixels:.0f} 像素，裁剪并放大 {attacker.ROI_SCALE} 倍后 {roi_pixels:.0f} 像素'
+          f'（{full_pixels / roi_pixels:.1f}x 更小），字形完整落在区域内 {inside:.2%}')
+
+    recognizer = attacker.TemplateRecognizer()
+    print(f'模板匹配: 整张 {template_accuracy(attacker, recognizer, samples, False):.2%}  '
+          f'裁剪 {template_accuracy(attacker, recognizer, samples, True):.2%}')
+
+    state = {'i': 0}
+
+    def next_image():
+        state['i'] = (state['i'] + 1) % len(images)
+        return images[state['i']]
+
+    full = timeit(lambda: attacker._compute_variants(next_image()), number=50)
+    roi = timeit(lambda: attacker._compute_variants(next_image(), roi=True), number=50)
+    print(f'预处理: 整张 {full * 1e6:8.1f} us/图  裁剪 {roi * 1e6:8.1f} us/图（含定位）  加速 {full / roi:.1f}x')
+
+    if not args.tesseract:
+        print('未找到 tesseract，跳过 OCR 耗时和准确率对比（安装后或用 --tesseract 指定路径重新运行）', file=sys.stderr)
+        return 0
+    subset = samples[:args.tesseract_number]
+    for label, enabled in (('整张', False), ('裁剪', True)):
+        accuracy, median = run_ocr(attacker, subset, enabled)
+        print(f'tesseract {label}: {len(subset)} 张  算式正确 {accuracy:6.1%}  中位数 {median:8.1f} ms/张')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""模板匹配与 tesseract 识别数学验证码的对比：python -m benchmarks.bench_ocr_template [-n 500]
+
+用固定种子生成数学验证码（已知算式和答案），分别统计模板匹配（solve_math_captcha）与 tesseract
+网格投票（recognize_captcha）的算式识别准确率和每张耗时。未找到 tesseract 时只测量模板匹配。
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+
+from benchmarks.common import add_tesseract_argument, load_attacker, make_math_captchas
+
+
+def measure(samples, recognize):
+    """返回 (算式正确率, 每张耗时中位数 ms, p95 ms)"""
+    correct = 0
+    durations = []
+    for img, expression, _ in samples:
+        start = time.perf_counter()
+        text = recognize(img)
+        durations.append(time.perf_counter() - start)
+        correct += text == expression
+    durations.sort()
+    return (correct / len(samples), statistics.median(durations) * 1000,
+            durations[int(len(durations) * 0.95)] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模板匹配与 tesseract 识别数学验证码的准确率和耗时对比')
+    parser.add_argument('-n', '--number', type=int, default=500, help='验证码数量')
+    parser.add_argument('--tesseract-number', type=int, default=50, help='tesseract 识别的验证码数量（较慢）')
+    add_tesseract_argument(parser)
+    args = parser.parse_args()
+
+    attacker = load_attacker(args.tesseract)
+    samples = make_math_captchas(args.number)
+
+    start = time.perf_counter()
+    recognizer = attacker.TemplateRecognizer()
+    print(f'模板构建 {(time.perf_counter() - start) * 1000:.1f} ms，{len(recognizer.labels)} 个模板')
+
+    answers = sum(recognizer.recognize(img)[1] == answer for img, _, answer in samples)
+    accuracy, median, p95 = measure(samples, lambda img: recognizer.recognize(img)[0])
+    print(f'模板匹配   {len(samples):5d} 张  算式正确 {accuracy:6.1%}  答案正确 {answers / len(samples):6.1%}  '
+          f'中位数 {median:7.2f} ms  p95 {p95:7.2f} ms')
+
+    if not args.tesseract:
+        print('未找到 tesseract，跳过对比（安装后或用 --tesseract 指定路径重新运行）', file=sys.stderr)
+        return 0
+    subset = samples[:args.tesseract_number]
+    with contextlib.redirect_stdout(io.StringIO()):
+        accuracy, median, p95 = measure(subset, attacker.recognize_captcha)
+    print(f'tesseract  {len(subset):5d} 张  算式正确 {accuracy:6.1%}  '
+          f'中位数 {median:7.2f} ms  p95 {p95:7.2f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
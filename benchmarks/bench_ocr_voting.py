@@ -0,0 +1,65 @@
+"""自适应投票基准：python -m benchmarks.bench_ocr_voting [-n 20] [--train 40]
+
+先用 --train 张验证码积累各组合的胜率（临时统计文件），再在另外 -n 张验证码上比较：
+完整网格投票与自适应投票的平均 tesseract 调用次数、每张耗时，以及两者结果的一致率。
+需要本机安装 tesseract（--tesseract 指定路径，默认从 PATH 查找）。
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.common import add_tesseract_argument, load_attacker, make_math_captchas
+
+
+def make_captchas(start, count):
+    return [img for img, _, _ in make_math_captchas(count, start, png=True)]
+
+
+def solve_all(attacker, images, stats):
+    results, seconds = [], []
+    for img in images:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(attacker.recognize_captcha(img, stats=stats))
+        seconds.append(time.perf_counter() - start)
+    return results, statistics.median(seconds) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='自适应投票与完整网格投票的对比')
+    parser.add_argument('-n', '--number', type=int, default=20, help='测量用的验证码数量')
+    parser.add_argument('--train', type=int, default=40, help='积累胜率用的验证码数量')
+    add_tesseract_argument(parser)
+    args = parser.parse_args()
+    if not args.tesseract:
+        print('未找到 tesseract，请安装或用 --tesseract 指定路径', file=sys.stderr)
+        return 1
+
+    attacker = load_attacker(args.tesseract)
+    images = make_captchas(args.train, args.number)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = attacker.OcrStats(os.path.join(tmp, 'ocr_stats.json'))
+        solve_all(attacker, make_captchas(0, args.train), stats)
+        pruned = sum(1 for key in stats.pairs if stats.pruned(key))
+
+        full, full_ms = solve_all(attacker, images, None)
+        solves, total_calls, total_grid_calls = stats.solves, stats.calls, stats.grid_calls
+        adaptive, adaptive_ms = solve_all(attacker, images, stats)
+        calls = (stats.calls - total_calls) / (stats.solves - solves)
+        grid_calls = (stats.grid_calls - total_grid_calls) / (stats.solves - solves)
+
+    agree = sum(a == b for a, b in zip(full, adaptive)) / len(images)
+    print(f'训练 {args.train} 张后剪掉 {pruned} 个从未胜出的组合')
+    print(f'完整网格  {grid_calls:5.1f} 次调用/张  {full_ms:8.1f} ms/张')
+    print(f'自适应    {calls:5.1f} 次调用/张  {adaptive_ms:8.1f} ms/张  与完整网格结果一致 {agree:.0%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""OCR 预处理基准：python -m benchmarks.bench_preprocess"""
+import random
+
+from PIL import ImageEnhance, ImageFilter, ImageMorph, ImageOps, ImageStat
+
+from benchmarks.common import load_module, timeit
+
+
+def process_image_pil(img):
+    """原实现：lambda 阈值（point 对每个灰度级回调）、ImageMorph 膨胀、ImageEnhance 对比度"""
+    gray = img.convert('L')
+    threshold = ImageStat.Stat(gray).mean[0] * 0.7
+    binary = gray.point(lambda x: 255 if x > threshold else 0)
+    inverted = ImageOps.invert(binary)
+    denoised = gray.filter(ImageFilter.GaussianBlur(radius=0.8)).point(lambda x: 255 if x > threshold else 0)
+    _, dilated = ImageMorph.MorphOp(op_name='dilation4').apply(inverted)
+    sharp = ImageEnhance.Contrast(gray).enhance(2.5).filter(ImageFilter.SHARPEN)
+    return [binary, inverted, denoised, ImageOps.invert(dilated), sharp]
+
+
+def main():
+    app = load_module('3in1.py', 'captcha_3in1')
+    attacker = load_module('attacker.py', 'attacker')
+
+    random.seed(0)
+    images = [app.generate_captcha()[0] for _ in range(32)]
+    state = {'i': 0}
+
+    def next_image():
+        state['i'] = (state['i'] + 1) % len(images)
+        return images[state['i']]
+
+    pil = timeit(lambda: process_image_pil(next_image()))
+    vectorized = timeit(lambda: attacker._compute_variants(next_image()))
+    for img in images:
+        attacker.process_image(img)
+    cached = timeit(lambda: attacker.process_image(next_image()))
+
+    print(f'预处理（原 PIL 实现）: {pil * 1e6:8.1f} us/图')
+    print(f'预处理（共享数组）   : {vectorized * 1e6:8.1f} us/图  加速 {pil / vectorized:.1f}x')
+    print(f'预处理（缓存命中）   : {cached * 1e6:8.1f} us/图  加速 {pil / cached:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""渲染进程池吞吐基准：python -m benchmarks.bench_render_executor [-n 400] [-p 0,2,4]
+
+用多个请求线程并发生成验证码，比较同步渲染（0 个进程）和不同进程数下每秒完成的渲染数。
+单核机器上进程池不会更快，只能看到进程间传递字节的额外开销。
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import load_module
+from render_executor import RenderExecutor
+
+
+def throughput(executor, func, args_list, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda args: executor.run(func, *args), args_list))
+    return len(args_list) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='渲染进程池吞吐基准')
+    parser.add_argument('-n', '--number', type=int, default=400, help='每种验证码渲染次数')
+    parser.add_argument('-p', '--processes', default=f'0,{os.cpu_count()}', help='要比较的进程数（逗号分隔）')
+    args = parser.parse_args()
+
+    app = load_module('3in1.py', 'captcha_3in1')
+    random.seed(20240601)
+    params = [app.captcha_generator.generate_params() for _ in range(64)]
+    cases = {
+        'math': (app.render_math_captcha, [()] * args.number),
+        'slide_bg': (app.render_slide_image, [(params[i % len(params)], 'bg') for i in range(args.number)]),
+    }
+
+    print(f'CPU 核数: {os.cpu_count()}')
+    for processes in map(int, args.processes.split(',')):
+        executor = RenderExecutor(processes, app.warm_render_caches)
+        try:
+            app.warm_render_caches()
+        except OSError:
+            pass
+        executor.start()
+        threads = max(4, processes * 2)
+        for name, (func, args_list) in cases.items():
+            rate = throughput(executor, func, args_list, threads)
+            print(f'{processes:2d} 进程  {name:9s} {rate:8.1f} 张/秒')
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""轨迹分析基准：python -m benchmarks.bench_track_analyzer"""
+import math
+import random
+
+import numpy as np
+
+from benchmarks.common import timeit
+from track_analyzer import TrackAnalyzer
+
+
+class LegacyTrackAnalyzer:
+    """原实现：逐点循环（用作结果对照和性能基线）"""
+
+    def __init__(self, max_speed=1500):
+        self.min_track_length = 10
+        self.max_speed = max_speed
+        self.max_deviation = 50
+        self.min_y_changes = 3
+        self.min_y_change = 1
+        self.max_slide_time = 5000
+        self.min_slide_time = 100
+
+    def analyze_tracks(self, tracks):
+        if len(tracks) < self.min_track_length:
+            return False, "轨迹过短"
+        total_time = tracks[-1]['timestamp'] - tracks[0]['timestamp']
+        if total_time > self.max_slide_time:
+            return False, "滑动时间过长"
+        if total_time < self.min_slide_time:
+            return False, "滑动时间过短"
+        y_changes = 0
+        last_y = tracks[0]['y']
+        for i in range(1, len(tracks)):
+            prev = tracks[i-1]
+            curr = tracks[i]
+            dt = (curr['timestamp'] - prev['timestamp']) / 1000
+            if dt == 0:
+                return False, "移动速度异常"
+            dx = curr['x'] - prev['x']
+            dy = curr['y'] - prev['y']
+            speed = math.sqrt(dx*dx + dy*dy) / dt
+            if speed > self.max_speed:
+                return False, "移动速度过快"
+            if abs(dy) > self.max_deviation:
+                return False, "垂直移动幅度过大"
+            if abs(curr['y'] - last_y) >= self.min_y_change:
+                y_changes += 1
+                last_y = curr['y']
+        if y_changes < self.min_y_changes:
+            return False, "移动轨迹过于平直"
+        return True, "轨迹正常"
+
+
+def make_track(rng):
+    """随机生成一条轨迹：大部分像真人拖动，其余覆盖各种异常情况"""
+    kind = rng.choice(['human', 'human', 'human', 'straight', 'fast', 'zero_dt', 'steep', 'short', 'float', 'slow'])
+    length = rng.randint(3, 8) if kind == 'short' else rng.randint(10, 120)
+    t = 1_700_000_000_000 + rng.randint(0, 10**6)
+    x, y = 10, 75
+    tracks = []
+    for i in range(length):
+        tracks.append({'x': x, 'y': y, 'timestamp': t})
+        step = rng.randint(5, 20) if kind == 'slow' else rng.randint(8, 30)
+        t += step
+        x += rng.randint(0, 6) if kind != 'fast' else rng.randint(20, 80)
+        if kind == 'straight':
+            y += 1 if i == length // 2 else 0
+        elif kind == 'steep' and i == length - 3:
+            y += 60
+        elif kind == 'float':
+            y += rng.choice([0, 0, 0.5, -0.5, 0.25, 1.5])
+        else:
+            y += rng.choice([0, 0, 0, 1, -1, 2])
+        if kind == 'zero_dt' and i == length // 3:
+            t -= step
+    return tracks
+
+
+def make_long_track(rng, length):
+    """正常拖动轨迹，点数越多采样间隔越短（最短 1~2ms 一个点）"""
+    t = 1_700_000_000_000
+    x, y = 10, 75
+    tracks = []
+    for _ in range(length):
+        tracks.append({'x': x, 'y': y, 'timestamp': t})
+        t += rng.randint(1, 2) * max(1, 300 // length)
+        x += rng.choice([0, 0, 1])
+        y += rng.choice([0, 0, 0, 0, 0, 0, 1, -1])
+    return tracks
+
+
+def main():
+    rng = random.Random(0)
+    traces = [make_track(rng) for _ in range(5000)]
+
+    expected_default = None
+    for max_speed in (1500, 2000):
+        legacy = LegacyTrackAnalyzer(max_speed)
+        analyzer = TrackAnalyzer(max_speed)
+        expected = [legacy.analyze_tracks(tracks) for tracks in traces]
+        single = [analyzer.analyze_tracks(tracks) for tracks in traces]
+        batch = analyzer.analyze_batch(traces)
+        assert single == expected, '逐条结果与原实现不一致'
+        assert batch == expected, '批量结果与原实现不一致'
+        expected_default = expected_default or expected
+    reasons = {}
+    for _, reason in expected:
+        reasons[reason] = reasons.get(reason, 0) + 1
+    print(f'{len(traces)} 条轨迹结果与原实现一致: {reasons}')
+
+    legacy = LegacyTrackAnalyzer()
+    analyzer = TrackAnalyzer()
+    print('单条（正常轨迹）      逐点循环   向量化(含转换)   向量化(已是数组)')
+    for length in (60, 300, 1000, 3000):
+        tracks = make_long_track(rng, length)
+        assert legacy.analyze_tracks(tracks) == analyzer.analyze_tracks(tracks) == (True, "轨迹正常")
+        x, y, t = analyzer.to_arrays(tracks)
+        number = max(20, 20000 // length)
+        loop_time = timeit(lambda: legacy.analyze_tracks(tracks), number=number)
+        vector_time = timeit(lambda: analyzer.analyze_tracks(tracks), number=number)
+        array_time = timeit(lambda: analyzer.analyze_arrays(x, y, t), number=number)
+        print(f'  {length:5d} 点  {loop_time * 1e6:10.1f} us  {vector_time * 1e6:8.1f} us {loop_time / vector_time:4.1f}x'
+              f'  {array_time * 1e6:8.1f} us {loop_time / array_time:5.1f}x')
+
+    loop_batch = timeit(lambda: [legacy.analyze_tracks(tracks) for tracks in traces], number=1, repeat=3)
+    batch_time = timeit(lambda: analyzer.analyze_batch(traces), number=1, repeat=3)
+    print(f'批量（{len(traces)} 条）')
+    print(f'  逐条循环          : {loop_batch * 1e3:8.1f} ms')
+    print(f'  analyze_batch     : {batch_time * 1e3:8.1f} ms  {loop_batch / batch_time:.1f}x')
+
+    # 离线回放时轨迹通常已按数组存放，只需要一次性分析
+    lengths = [len(tracks) for tracks in traces]
+    x = np.array([p['x'] for tracks in traces for p in tracks], dtype=np.float64)
+    y = np.array([p['y'] for tracks in traces for p in tracks], dtype=np.float64)
+    t = np.array([p['timestamp'] for tracks in traces for p in tracks], dtype=np.float64)
+    assert analyzer.analyze_batch_arrays(x, y, t, lengths) == expected_default
+    array_batch = timeit(lambda: analyzer.analyze_batch_arrays(x, y, t, lengths), number=1, repeat=5)
+    print(f'  analyze_batch_arrays: {array_batch * 1e3:6.1f} ms  {loop_batch / array_batch:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import importlib.util
+import io
+import os
+import random
+import shutil
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAPTCHA_SEED = 20240601  # OCR 基准的验证码种子，样本 i 的种子为 CAPTCHA_SEED + i
+
+
+def load_module(filename, module_name):
+    """按路径加载仓库根目录下的脚本（math.py 与标准库重名、3in1.py 不是合法模块名）"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    # 脚本里的字体和背景路径都是相对仓库根目录的
+    os.chdir(ROOT)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_math_captchas(count, start=0, png=False):
+    """用固定种子生成数学验证码，返回 [(图片, 算式, 答案)]
+
+    同一种子先取算式再重新生成图片，两者一致；png 为 True 时图片经过一次 PNG 编码和解码，
+    与攻击脚本从接口下载到的图片相同。
+    """
+    app = load_module('3in1.py', 'captcha_3in1')
+    samples = []
+    for i in range(start, start + count):
+        random.seed(CAPTCHA_SEED + i)
+        expression, _ = app.generate_math_expression()
+        random.seed(CAPTCHA_SEED + i)
+        img, answer = app.generate_captcha()
+        if png:
+            buffer = io.BytesIO()
+            img.save(buffer, 'PNG')
+            img = Image.open(io.BytesIO(buffer.getvalue()))
+        samples.append((img, expression.replace(' ', ''), answer))
+    return samples
+
+
+def add_tesseract_argument(parser):
+    parser.add_argument('--tesseract', default=shutil.which('tesseract'),
+                        help='tesseract 可执行文件路径（默认从 PATH 查找）')
+
+
+def load_attacker(tesseract=None):
+    """加载 attacker.py，给出 tesseract 路径时改用该可执行文件"""
+    attacker = load_module('attacker.py', 'attacker')
+    if tesseract:
+        attacker.pytesseract.pytesseract.tesseract_cmd = tesseract
+    return attacker
+
+
+def timeit(func, number=200, repeat=5):
+    """返回单次调用耗时（秒）的中位数"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
@@ -0,0 +1,36 @@
+"""pytest 运行基准套件时的命令行选项和共享夹具（见 benchmarks/test_suite.py）"""
+import os
+
+import pytest
+
+from benchmarks import suite
+from benchmarks.common import load_module
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('captcha-bench', '验证码基准')
+    group.addoption('--bench-number', type=int, default=200, help='每个用例的调用次数（默认 200）')
+    group.addoption('--bench-json', default='benchmark_results.json',
+                    help='结果文件路径，格式与 python -m benchmarks.suite run 相同')
+
+
+@pytest.fixture(scope='session')
+def bench_number(request):
+    return request.config.getoption('bench_number')
+
+
+@pytest.fixture(scope='session')
+def bench_results(request, bench_number):
+    """收集各用例的结果，会话结束时写入 --bench-json，可交给 suite compare 与基线比较"""
+    # load_module 会切换到仓库根目录，先按启动时的工作目录解析结果路径
+    output = os.path.abspath(request.config.getoption('bench_json'))
+    results = {}
+    yield results
+    if results:
+        suite.write_report(output, results, bench_number)
+        suite.print_results(results)
+
+
+@pytest.fixture(scope='session')
+def captcha_app(bench_results):
+    return load_module('3in1.py', 'captcha_3in1')
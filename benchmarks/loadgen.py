@@ -0,0 +1,433 @@
+"""3in1.py 端到端压测：python -m benchmarks.loadgen [--rate 50] [--concurrency 32] [--duration 30]
+
+默认在本地启动一个 3in1.py 进程（开启 CAPTCHA_TEST_HOOKS，端口取 --port），按完整流程压测：
+获取验证码 -> 通过测试钩子取得答案 -> 提交验证。也可以用 --url 压测已经启动的服务
+（服务需设置 CAPTCHA_TEST_HOOKS=1，配合 --pid 采样其内存）。
+
+两种到达模式：
+- 闭环（默认）：concurrency 个虚拟用户各自循环执行流程
+- 开环（--rate）：按泊松过程以指定速率发起流程，同时进行的流程数不超过 concurrency；
+  流程耗时从计划到达时刻算起，服务端变慢造成的排队也计入延迟
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from benchmarks.common import ROOT
+
+FLOWS = ('math', 'word', 'slide')
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """最简 HTTP/1.1 客户端连接：支持 keep-alive、Content-Length 和 chunked 响应"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HTTPError('连接被关闭')
+        status = int(status_line.split()[1])
+        response_headers = []
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers.append((name.strip().lower(), value.strip()))
+        header_map = dict(response_headers)
+
+        if header_map.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b''.join(chunks)
+        elif 'content-length' in header_map:
+            data = await self.reader.readexactly(int(header_map['content-length']))
+        else:
+            data = await self.reader.read()
+            header_map['connection'] = 'close'
+
+        if header_map.get('connection', '').lower() == 'close' or status_line.startswith(b'HTTP/1.0'):
+            self.close()
+        return status, response_headers, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class ConnectionPool:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.idle = []
+
+    def acquire(self):
+        return self.idle.pop() if self.idle else Connection(self.host, self.port)
+
+    def release(self, conn):
+        if conn.writer is not None:
+            self.idle.append(conn)
+
+
+class Session:
+    """一个虚拟用户：独立的 Cookie、模拟客户端地址，请求耗时记录到 stats"""
+
+    def __init__(self, pool, stats, client):
+        self.pool = pool
+        self.stats = stats
+        self.client = client
+        self.cookies = {}
+
+    async def request(self, name, method, path, form=None, json_body=None):
+        headers = {'X-Test-Client': self.client}
+        body = b''
+        if form is not None:
+            body = urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+
+        conn = self.pool.acquire()
+        start = time.perf_counter()
+        try:
+            try:
+                status, response_headers, data = await conn.request(method, path, headers, body)
+            except (HTTPError, ConnectionError, asyncio.IncompleteReadError):
+                # 复用的空闲连接可能已被服务端关闭，换新连接重试一次
+                conn.close()
+                status, response_headers, data = await conn.request(method, path, headers, body)
+        except (OSError, HTTPError, asyncio.IncompleteReadError, ValueError, IndexError):
+            conn.close()
+            self.stats.record(name, time.perf_counter() - start, None)
+            raise
+        self.pool.release(conn)
+        self.stats.record(name, time.perf_counter() - start, status)
+
+        for header, value in response_headers:
+            if header == 'set-cookie':
+                cookie_name, _, cookie_value = value.split(';', 1)[0].partition('=')
+                self.cookies[cookie_name.strip()] = cookie_value.strip()
+        return status, data
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}   # 请求名 -> 耗时列表
+        self.statuses = {}    # 请求名 -> {状态码: 次数}
+        self.flows = {}       # 流程名 -> {'ok', 'failed', 'limited', 'error', 'latencies'}
+
+    def record(self, name, seconds, status):
+        self.latencies.setdefault(name, []).append(seconds)
+        counts = self.statuses.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def flow(self, name, outcome, seconds):
+        flow = self.flows.setdefault(name, {'ok': 0, 'failed': 0, 'limited': 0, 'error': 0, 'latencies': []})
+        flow[outcome] += 1
+        flow['latencies'].append(seconds)
+
+
+class RateLimited(Exception):
+    pass
+
+
+def check(status, data):
+    if status == 429:
+        raise RateLimited()
+    if status != 200:
+        raise HTTPError(f'HTTP {status}: {data[:80]!r}')
+    return data
+
+
+def slide_tracks(rng, target_x):
+    """从 0 拖到 target_x 的正常轨迹"""
+    steps = 40
+    t = int(time.time() * 1000)
+    y = 75
+    tracks = []
+    for i in range(steps + 1):
+        tracks.append({'x': round(target_x * i / steps), 'y': y, 'timestamp': t})
+        t += rng.randint(8, 16)
+        y += rng.choice([0, 0, 1, -1])
+    return tracks
+
+
+async def math_flow(session, rng):
+    check(*await session.request('math.captcha', 'GET', '/math/captcha'))
+    answer = json.loads(check(*await session.request('math.answer', 'GET', '/test/answer/math')))['answer']
+    data = check(*await session.request('math.verify', 'POST', '/math/verify', form={'captcha': str(answer)}))
+    return '验证成功' in data.decode('utf-8')
+
+
+async def word_flow(session, rng):
+    check(*await session.request('word.captcha', 'GET', '/word/captcha'))
+    answer = json.loads(check(*await session.request('word.answer', 'GET', '/test/answer/word')))['answer']
+    body = {'clicks': answer, 'mouse_trace': [[rng.randint(0, 400), rng.randint(0, 200)] for _ in range(12)],
+            'operation_time': 2.5}
+    data = check(*await session.request('word.verify', 'POST', '/word/verify', json_body=body))
+    return json.loads(data)['status'] == 'success'
+
+
+async def slide_flow(session, rng):
+    captcha = json.loads(check(*await session.request('slide.get_captcha', 'GET', '/slide/get_captcha')))
+    verify_id = captcha['verify_id']
+    check(*await session.request('slide.bg_image', 'GET', f'/slide/bg_image/{verify_id}'))
+    check(*await session.request('slide.gap_image', 'GET', f'/slide/gap_image/{verify_id}'))
+    answer = json.loads(check(*await session.request('slide.answer', 'GET', f'/test/answer/slide?verify_id={verify_id}')))
+    body = {'verify_id': verify_id, 'x': answer['answer'], 'mouse_tracks': slide_tracks(rng, answer['answer'])}
+    data = check(*await session.request('slide.verify', 'POST', '/slide/verify', json_body=body))
+    return json.loads(data)['success']
+
+
+FLOW_FUNCS = {'math': math_flow, 'word': word_flow, 'slide': slide_flow}
+
+
+async def run_flow(name, session, rng, stats, scheduled):
+    try:
+        outcome = 'ok' if await FLOW_FUNCS[name](session, rng) else 'failed'
+    except RateLimited:
+        outcome = 'limited'
+    except (OSError, HTTPError, asyncio.IncompleteReadError, ValueError, KeyError, IndexError, TypeError):
+        outcome = 'error'
+    stats.flow(name, outcome, time.perf_counter() - scheduled)
+
+
+def read_rss(pid):
+    """读取进程常驻内存（MB），无法读取时返回 None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pid, samples, start, interval=1.0):
+    while True:
+        rss = read_rss(pid)
+        if rss is not None:
+            samples.append((round(time.perf_counter() - start, 1), round(rss, 1)))
+        await asyncio.sleep(interval)
+
+
+async def load(args, host, port, pid):
+    stats = Stats()
+    pool = ConnectionPool(host, port)
+    rng = random.Random(args.seed)
+    names = [name for name, weight in args.mix.items() for _ in range(weight)]
+    clients = itertools.cycle([f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(1, args.clients + 1)])
+    rss_samples = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    sampler = asyncio.create_task(sample_rss(pid, rss_samples, start)) if pid else None
+
+    if args.rate:
+        # 开环：泊松到达，超过并发上限的流程排队等待（耗时仍从计划到达时刻算起）
+        semaphore = asyncio.Semaphore(args.concurrency)
+        tasks = set()
+
+        async def arrival(name, session, scheduled):
+            async with semaphore:
+                await run_flow(name, session, random.Random(rng.random()), stats, scheduled)
+
+        scheduled = start
+        while True:
+            scheduled += rng.expovariate(args.rate)
+            if scheduled >= deadline:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            session = Session(pool, stats, next(clients))
+            task = asyncio.create_task(arrival(rng.choice(names), session, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    else:
+        # 闭环：每个虚拟用户连续执行流程，每轮使用新的会话和下一个客户端地址
+        async def user(index):
+            user_rng = random.Random(args.seed + index)
+            while time.perf_counter() < deadline:
+                await run_flow(user_rng.choice(names), Session(pool, stats, next(clients)), user_rng, stats,
+                               time.perf_counter())
+
+        await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+
+    elapsed = time.perf_counter() - start
+    if sampler is not None:
+        sampler.cancel()
+        rss = read_rss(pid)
+        if rss is not None:
+            rss_samples.append((round(elapsed, 1), round(rss, 1)))
+    for conn in pool.idle:
+        conn.close()
+    return stats, elapsed, rss_samples
+
+
+def percentiles(values):
+    if not values:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2)}
+
+
+def build_report(stats, elapsed, rss_samples, args):
+    flows = {}
+    for name, flow in sorted(stats.flows.items()):
+        total = flow['ok'] + flow['failed'] + flow['limited'] + flow['error']
+        flows[name] = {
+            'flows': total,
+            'ok': flow['ok'],
+            'failed': flow['failed'],
+            'throughput': round(flow['ok'] / elapsed, 2),
+            'error_rate': round(flow['error'] / total, 4),
+            'limited_rate': round(flow['limited'] / total, 4),
+        }
+        flows[name].update(percentiles(flow['latencies']))
+
+    requests = {}
+    for name, latencies in sorted(stats.latencies.items()):
+        counts = stats.statuses[name]
+        total = sum(counts.values())
+        errors = sum(count for status, count in counts.items() if status is None or status >= 500)
+        requests[name] = {
+            'requests': total,
+            'rps': round(total / elapsed, 2),
+            'error_rate': round(errors / total, 4),
+            'limited_rate': round(counts.get(429, 0) / total, 4),
+            'statuses': {str(status): count for status, count in sorted(counts.items(), key=lambda item: str(item[0]))},
+        }
+        requests[name].update(percentiles(latencies))
+
+    return {
+        'config': {'rate': args.rate, 'concurrency': args.concurrency, 'duration': args.duration,
+                   'clients': args.clients, 'mix': args.mix, 'seed': args.seed},
+        'elapsed': round(elapsed, 2),
+        'flows': flows,
+        'requests': requests,
+        'rss_mb': rss_samples,
+    }
+
+
+def print_report(report):
+    print(f'\n耗时 {report["elapsed"]}s，配置 {report["config"]}')
+    print(f'\n{"流程":8s} {"完成":>7s} {"成功/s":>8s} {"错误率":>7s} {"429率":>7s} {"p50":>9s} {"p95":>9s} {"p99":>9s}')
+    for name, flow in report['flows'].items():
+        print(f'{name:8s} {flow["flows"]:7d} {flow["throughput"]:8.1f} {flow["error_rate"]:7.1%} '
+              f'{flow["limited_rate"]:7.1%} {flow["p50_ms"]:8.1f}ms {flow["p95_ms"]:8.1f}ms {flow["p99_ms"]:8.1f}ms')
+    print(f'\n{"请求":18s} {"次数":>7s} {"次/s":>8s} {"错误率":>7s} {"429率":>7s} {"p50":>9s} {"p95":>9s} {"p99":>9s}')
+    for name, item in report['requests'].items():
+        print(f'{name:18s} {item["requests"]:7d} {item["rps"]:8.1f} {item["error_rate"]:7.1%} '
+              f'{item["limited_rate"]:7.1%} {item["p50_ms"]:8.1f}ms {item["p95_ms"]:8.1f}ms {item["p99_ms"]:8.1f}ms')
+    if report['rss_mb']:
+        step = max(1, len(report['rss_mb']) // 10)
+        timeline = ', '.join(f'{t:g}s {rss:.0f}MB' for t, rss in report['rss_mb'][::step])
+        peak = max(rss for _, rss in report['rss_mb'])
+        print(f'\n服务端 RSS: {timeline}（峰值 {peak:.0f}MB）')
+
+
+def start_server(port, log_path):
+    """启动本地 3in1.py（开启测试钩子），等待端口可连接"""
+    env = dict(os.environ, CAPTCHA_TEST_HOOKS='1', PORT=str(port))
+    log = open(log_path, 'wb') if log_path else subprocess.DEVNULL
+    proc = subprocess.Popen([sys.executable, '3in1.py'], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'3in1.py 启动失败，退出码 {proc.returncode}')
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 1))
+            return proc
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('等待 3in1.py 启动超时')
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in FLOWS:
+            raise argparse.ArgumentTypeError(f'未知的流程: {name}')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='3in1.py 端到端压测')
+    parser.add_argument('--url', help='压测已启动的服务（需开启 CAPTCHA_TEST_HOOKS），不指定时在本地启动')
+    parser.add_argument('--pid', type=int, help='配合 --url 采样该进程的 RSS')
+    parser.add_argument('--port', type=int, default=5055, help='本地启动时使用的端口')
+    parser.add_argument('--server-log', help='本地启动时服务端日志写入的文件')
+    parser.add_argument('--rate', type=float, help='开环模式：每秒发起的流程数（不指定为闭环模式）')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='虚拟用户数 / 开环模式的最大并发流程数')
+    parser.add_argument('-d', '--duration', type=float, default=20, help='压测时长（秒）')
+    parser.add_argument('--clients', type=int, default=1000, help='模拟的客户端地址数量，流程轮流使用（服务端按地址限流）')
+    parser.add_argument('--mix', type=parse_mix, default='math=1,word=1,slide=1', help='流程权重，如 math=2,slide=1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='把结果写入 JSON 文件')
+    args = parser.parse_args(argv)
+    if isinstance(args.mix, str):
+        args.mix = parse_mix(args.mix)
+
+    proc = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port, pid = url.hostname, url.port or 80, args.pid
+    else:
+        proc = start_server(args.port, args.server_log)
+        host, port, pid = '127.0.0.1', args.port, proc.pid
+    try:
+        stats, elapsed, rss_samples = asyncio.run(load(args, host, port, pid))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    report = build_report(stats, elapsed, rss_samples, args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
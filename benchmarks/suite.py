@@ -0,0 +1,286 @@
+"""验证码基准套件
+
+    python -m benchmarks.suite run -o benchmark_results.json        # 运行全部基准并写入 JSON
+    python -m benchmarks.suite run --only slide,track              # 只运行部分类型
+    python -m benchmarks.suite compare baseline.json benchmark_results.json   # 与基线比较，有退化时返回 1
+    python -m pytest benchmarks/test_suite.py --bench-json benchmark_results.json   # 以 pytest 运行同样的用例
+
+每个用例运行前都用固定种子重置 random，同一台机器上多次运行的输入完全相同。
+耗时取每次调用的中位数；PNG 字节数取固定种子下若干张图的平均值。
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+import PIL
+
+from benchmarks.common import load_module
+
+SEED = 20240601
+GROUPS = ('math', 'word', 'slide', 'track')
+
+
+def measure(func, number, setup=None):
+    """逐次计时，返回每次调用耗时（秒）列表；setup 在每次调用前执行，不计入耗时"""
+    samples = []
+    for _ in range(number):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples, **extra):
+    samples = sorted(samples)
+    result = {
+        'median_us': round(statistics.median(samples) * 1e6, 2),
+        'p95_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 2),
+        'iterations': len(samples),
+    }
+    result.update(extra)
+    return result
+
+
+def png_bytes(img):
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def bench_images(name, render, number):
+    """渲染耗时、PNG 编码耗时和平均字节数"""
+    results = {}
+    random.seed(SEED)
+    results[f'{name}.render'] = summarize(measure(render, number))
+
+    random.seed(SEED)
+    images = [render() for _ in range(min(number, 50))]
+    encoded = [png_bytes(img) for img in images]
+    state = {'i': 0}
+
+    def encode_next():
+        png_bytes(images[state['i'] % len(images)])
+        state['i'] += 1
+
+    results[f'{name}.encode'] = summarize(measure(encode_next, number),
+                                          bytes=round(sum(map(len, encoded)) / len(encoded), 1))
+    return results
+
+
+def bench_math(app, number):
+    results = bench_images('math', lambda: app.generate_captcha()[0], number)
+
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['captcha'] = '42'
+        session['captcha_time'] = time.time() + 3600
+    # 答错不会清除会话，每次请求走完整的校验路径
+    verify = lambda: client.post('/math/verify', data={'captcha': '0'})
+    results['math.verify'] = summarize(measure(verify, number))
+    return results
+
+
+def bench_word(app, number):
+    try:
+        app.get_hanzi_atlas()
+    except OSError as e:
+        return {'word.render': {'skipped': f'无法加载汉字字体: {e}'}}
+
+    def render():
+        return app.generate_captcha_image(app.generate_hanzi_list())[0]
+
+    results = bench_images('word', render, number)
+
+    client = app.app.test_client()
+    hanzi_list = list('验证码字')
+
+    def set_session():
+        with client.session_transaction() as session:
+            session['captcha'] = {'hanzi_list': hanzi_list, 'start_time': time.time()}
+
+    body = {'clicks': hanzi_list, 'mouse_trace': [[i, i] for i in range(20)], 'operation_time': 3}
+    verify = lambda: client.post('/word/verify', json=body)
+    results['word.verify'] = summarize(measure(verify, number, setup=set_session))
+    return results
+
+
+def bench_slide(app, number):
+    generator = app.captcha_generator
+    random.seed(SEED)
+    params = [generator.generate_params() for _ in range(64)]
+    state = {'i': 0}
+
+    def next_params():
+        state['i'] += 1
+        return params[state['i'] % len(params)]
+
+    results = {}
+    random.seed(SEED)
+    results['slide.generate'] = summarize(measure(generator.generate, number))
+    results.update(bench_images('slide', lambda: generator.render(next_params())[0], number))
+
+    gaps = [png_bytes(generator.render_gap_image(p)) for p in params[:50]]
+    results['slide.encode']['gap_bytes'] = round(sum(map(len, gaps)) / len(gaps), 1)
+
+    # 轨迹正常但位置错误：经过轨迹分析和位置检查，且不会释放验证记录
+    client = app.app.test_client()
+    body = {'verify_id': None, 'x': -1000, 'mouse_tracks': human_track(random.Random(SEED), 120)}
+
+    def ensure_entry():
+        # 运行时间超过有效期时重新分配
+        if body['verify_id'] is None or app.verification_data.get(body['verify_id']) is None:
+            body['verify_id'], _ = app.verification_data.allocate(params[0])
+
+    verify = lambda: client.post('/slide/verify', json=body)
+    results['slide.verify'] = summarize(measure(verify, number, setup=ensure_entry))
+    app.verification_data.free(body['verify_id'])
+    return results
+
+
+def human_track(rng, length):
+    """固定种子下的正常拖动轨迹"""
+    t = 1_700_000_000_000
+    x, y = 10, 75
+    tracks = []
+    for _ in range(length):
+        tracks.append({'x': x, 'y': y, 'timestamp': t})
+        t += rng.randint(5, 12)
+        x += rng.randint(0, 4)
+        y += rng.choice([0, 0, 0, 1, -1])
+    return tracks
+
+
+def bench_track(app, number):
+    analyzer = app.track_analyzer
+    rng = random.Random(SEED)
+    results = {}
+    for length in (60, 300):
+        tracks = human_track(rng, length)
+        assert analyzer.analyze_tracks(tracks)[0]
+        results[f'track.analyze_{length}'] = summarize(measure(lambda: analyzer.analyze_tracks(tracks), number))
+    traces = [human_track(rng, rng.randint(30, 300)) for _ in range(500)]
+    results['track.batch_500'] = summarize(measure(lambda: analyzer.analyze_batch(traces), max(5, number // 20)))
+    return results
+
+
+BENCHES = {'math': bench_math, 'word': bench_word, 'slide': bench_slide, 'track': bench_track}
+
+
+def write_report(output, results, number):
+    """把结果连同运行环境写入 JSON（compare 读取的格式）"""
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seed': SEED,
+            'number': number,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def run(args):
+    groups = args.only.split(',') if args.only else GROUPS
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        print(f'未知的基准类型: {", ".join(sorted(unknown))}', file=sys.stderr)
+        return 2
+    # load_module 会切换到仓库根目录
+    output = os.path.abspath(args.output)
+    app = load_module('3in1.py', 'captcha_3in1')
+
+    results = {}
+    for group in groups:
+        start = time.perf_counter()
+        results.update(BENCHES[group](app, args.number))
+        print(f'{group}: {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+    write_report(output, results, args.number)
+    print_results(results)
+    print(f'结果已写入 {output}', file=sys.stderr)
+    return 0
+
+
+def print_results(results):
+    for name, result in results.items():
+        if 'skipped' in result:
+            print(f'{name:22s} 跳过: {result["skipped"]}')
+            continue
+        line = f'{name:22s} {result["median_us"]:10.1f} us  (p95 {result["p95_us"]:.1f})'
+        if 'bytes' in result:
+            line += f'  {result["bytes"]:.0f} B'
+        print(line)
+
+
+def compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f'{"用例":22s} {"基线":>12s} {"当前":>12s} {"变化":>8s}')
+    for name in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(name, {}), current.get(name, {})
+        if 'median_us' not in old or 'median_us' not in new:
+            print(f'{name:22s} {"-" if "median_us" not in old else old["median_us"]:>12} '
+                  f'{"-" if "median_us" not in new else new["median_us"]:>12}')
+            continue
+        rows = [('', old['median_us'], new['median_us'], 'us')]
+        for key in ('bytes', 'gap_bytes'):
+            if key in old and key in new:
+                rows.append((f' ({key})', old[key], new[key], 'B'))
+        for suffix, old_value, new_value, unit in rows:
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            flag = ''
+            if change > args.threshold:
+                flag = '  <-- 退化'
+                regressions += 1
+            elif change < -args.threshold:
+                flag = '  改善'
+            print(f'{name + suffix:22s} {old_value:10.1f}{unit:>2s} {new_value:10.1f}{unit:>2s} {change:+8.1%}{flag}')
+
+    if regressions:
+        print(f'{regressions} 项超过 {args.threshold:.0%} 的退化阈值')
+        return 1
+    print('没有超过阈值的退化')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='验证码生成与验证基准套件')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='运行基准并写入 JSON')
+    run_parser.add_argument('-o', '--output', default='benchmark_results.json', help='结果文件路径')
+    run_parser.add_argument('-n', '--number', type=int, default=200, help='每个用例的调用次数')
+    run_parser.add_argument('--only', help='只运行指定类型（逗号分隔）: ' + ','.join(GROUPS))
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help='与基线结果比较')
+    compare_parser.add_argument('baseline', help='基线结果文件')
+    compare_parser.add_argument('current', help='当前结果文件')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help='判定为退化的相对变化（默认 0.10）')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
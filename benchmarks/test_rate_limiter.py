@@ -0,0 +1,125 @@
+"""共享内存限流器的单元测试：python -m pytest benchmarks/test_rate_limiter.py
+
+每个用例使用独立的共享内存名，结束时删除共享内存和锁文件。
+"""
+import multiprocessing
+import os
+import types
+import uuid
+
+import pytest
+
+import rate_limiter
+from rate_limiter import SharedRateLimiter
+
+
+@pytest.fixture
+def make_limiter():
+    created = []
+
+    def make(name=None, **kwargs):
+        limiter = SharedRateLimiter(name or f'captcha_rl_test_{uuid.uuid4().hex[:12]}', **kwargs)
+        created.append(limiter)
+        return limiter
+
+    yield make
+    for limiter in created:
+        limiter.unlink()
+        if limiter._shm is not None:
+            limiter.table = None
+            limiter._shm.close()
+        if limiter._lock_file is not None:
+            limiter._lock_file.close()
+        try:
+            os.remove(limiter._lock_path)
+        except FileNotFoundError:
+            pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动拨动的时钟，替换限流器使用的 time.time()"""
+    state = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(rate_limiter, 'time', types.SimpleNamespace(time=lambda: state.now))
+    return state
+
+
+def hits(limiter, client, count, limit=10, window=10):
+    return sum(limiter.hit('test', client, limit, window) for _ in range(count))
+
+
+def test_limit_within_one_window(make_limiter, clock):
+    limiter = make_limiter()
+    assert hits(limiter, 'a', 15) == 10
+    assert hits(limiter, 'b', 3) == 3
+    assert limiter.stats()['limited'] == 5
+
+
+def test_previous_window_is_weighted_by_overlap(make_limiter, clock):
+    limiter = make_limiter()
+    assert hits(limiter, 'a', 10) == 10
+    # 进入下一个窗口的一半：上一窗口的 10 次按 0.5 计，还能再放行 5 次
+    clock.now = 1015.0
+    assert hits(limiter, 'a', 10) == 5
+    clock.now = 1019.0
+    # 上一窗口计 10 * 0.1 = 1，当前窗口已有 5 次
+    assert hits(limiter, 'a', 10) == 4
+
+
+def test_window_rollover_drops_old_counts(make_limiter, clock):
+    limiter = make_limiter()
+    hits(limiter, 'a', 10)
+    clock.now = 1010.0
+    assert hits(limiter, 'a', 1) == 0
+    # 相隔超过一个窗口，上一窗口的计数不再计入
+    clock.now = 1030.0
+    assert hits(limiter, 'a', 15) == 10
+
+
+def test_full_probe_range_evicts_least_recently_used(make_limiter, clock):
+    limiter = make_limiter(slots=2, probes=2)
+    keys = {client: limiter._hash('test', client) for client in 'abcd'}
+    for client in 'ab':
+        hits(limiter, client, 1)
+        clock.now += 1
+    hits(limiter, 'a', 1)
+    clock.now += 1
+    hits(limiter, 'c', 1)
+    assert limiter.stats()['evictions'] == 1
+    assert set(limiter.table['key'].tolist()) == {keys['a'], keys['c']}
+
+    # 超过 stale_after 未访问的槽位直接复用，不计为淘汰
+    clock.now += limiter.stale_after + 1
+    hits(limiter, 'd', 1)
+    assert limiter.stats()['evictions'] == 1
+    assert keys['d'] in limiter.table['key'].tolist()
+
+
+def _hit_in_child(name, count, limit):
+    limiter = SharedRateLimiter(name)
+    allowed = sum(limiter.hit('test', 'shared', limit, 10 ** 9) for _ in range(count))
+    os._exit(allowed)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='需要 fork')
+def test_processes_share_one_table(make_limiter):
+    limiter = make_limiter()
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_hit_in_child, args=(limiter.name, 20, 30)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert sum(process.exitcode for process in processes) == 30
+
+    # 本进程连接同一张表，看到的是所有子进程的计数
+    assert not limiter.hit('test', 'shared', 30, 10 ** 9)
+    assert limiter.stats()['active'] == 1
+
+
+def test_unlink_keeps_the_lock_file(make_limiter):
+    limiter = make_limiter()
+    assert limiter.hit('test', 'a', 10, 10)
+    assert limiter.unlink()
+    assert os.path.exists(limiter._lock_path)
+    assert not SharedRateLimiter(limiter.name).unlink()
@@ -0,0 +1,21 @@
+"""pytest 形式的验证码基准：python -m pytest benchmarks/test_suite.py -s [--bench-number 200] [--bench-json 路径]
+
+每种验证码类型一个用例，调用 benchmarks.suite 中相同的基准函数（固定种子），
+结果在会话结束时写入 JSON，与 python -m benchmarks.suite run 的输出格式相同：
+
+    python -m benchmarks.suite compare baseline.json benchmark_results.json
+"""
+import pytest
+
+from benchmarks import suite
+
+
+@pytest.mark.parametrize('group', suite.GROUPS)
+def test_benchmark(group, captcha_app, bench_number, bench_results):
+    results = suite.BENCHES[group](captcha_app, bench_number)
+    bench_results.update(results)
+    skipped = [f'{name}: {result["skipped"]}' for name, result in results.items() if 'skipped' in result]
+    if skipped:
+        pytest.skip('; '.join(skipped))
+    for name, result in results.items():
+        assert result['median_us'] > 0, name
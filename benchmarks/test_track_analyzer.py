@@ -0,0 +1,79 @@
+"""增量轨迹分析的单元测试：python -m pytest benchmarks/test_track_analyzer.py
+
+分块喂入的结果应与一次分析整条轨迹（TrackAnalyzer.analyze_tracks）相同。
+"""
+import random
+
+import pytest
+
+from benchmarks.bench_track_analyzer import make_track
+from track_analyzer import REASONS, TOO_FAST, IncrementalTrackAnalyzer, TrackAnalyzer
+
+
+def analyze_in_chunks(analyzer, tracks, sizes):
+    incremental = IncrementalTrackAnalyzer(analyzer)
+    start = 0
+    for size in sizes:
+        incremental.feed(tracks[start:start + size])
+        start += size
+    incremental.feed(tracks[start:])
+    return incremental.finish()
+
+
+def random_track(rng):
+    """步长、间隔和点数都随机的轨迹，覆盖 make_track 很少产生的过长、过短和垂直偏移过大"""
+    length = rng.randint(3, 80)
+    dt_choices = rng.choice([[0, 10, 20], [5, 10, 20], [20, 40, 80], [60, 120, 150]])
+    dy_choices = rng.choice([[-1, 0, 0, 1], [0], [-60, 0, 60]])
+    x, y, t = 10, 75, 1_700_000_000_000
+    tracks = []
+    for _ in range(length):
+        tracks.append({'x': x, 'y': y, 'timestamp': t})
+        x += rng.randint(0, 6)
+        y += rng.choice(dy_choices)
+        t += rng.choice(dt_choices)
+    return tracks
+
+
+def random_chunk_sizes(rng, length):
+    sizes = []
+    while sum(sizes) < length:
+        sizes.append(rng.choice([0, 1, 1, 2, 3, 7, 16, 50]))
+    return sizes
+
+
+@pytest.mark.parametrize('max_speed', [1500, 2000])
+def test_incremental_matches_whole_track(max_speed):
+    rng = random.Random(20240601)
+    analyzer = TrackAnalyzer(max_speed)
+    seen = set()
+    for i in range(2000):
+        tracks = make_track(rng) if i % 2 else random_track(rng)
+        expected = analyzer.analyze_tracks(tracks)
+        assert analyze_in_chunks(analyzer, tracks, random_chunk_sizes(rng, len(tracks))) == expected
+        assert analyze_in_chunks(analyzer, tracks, []) == expected
+        seen.add(expected[1])
+    # 随机轨迹应覆盖全部判定结果，否则对照没有意义
+    assert seen == set(REASONS)
+
+
+def test_single_point_chunks_match_whole_track():
+    rng = random.Random(7)
+    analyzer = TrackAnalyzer()
+    for _ in range(200):
+        tracks = make_track(rng)
+        assert analyze_in_chunks(analyzer, tracks, [1] * len(tracks)) == analyzer.analyze_tracks(tracks)
+
+
+def test_abnormal_step_rejects_early_and_keeps_the_reason():
+    analyzer = TrackAnalyzer()
+    tracks = [{'x': 10 + i * 5, 'y': 75 + i % 2, 'timestamp': 1000 + i * 20} for i in range(30)]
+    # 跨块的一步过快：在第二块的第一个点处拒绝
+    tracks[10] = dict(tracks[10], x=tracks[9]['x'] + 500)
+    incremental = IncrementalTrackAnalyzer(analyzer)
+    assert incremental.feed(tracks[:10])
+    assert not incremental.feed(tracks[10:20])
+    assert incremental.reason == TOO_FAST
+    assert not incremental.feed(tracks[20:])
+    assert incremental.count == len(tracks)
+    assert incremental.finish() == analyzer.analyze_tracks(tracks) == (False, REASONS[TOO_FAST])
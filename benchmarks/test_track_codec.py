@@ -0,0 +1,89 @@
+"""紧凑轨迹格式的单元测试：python -m pytest benchmarks/test_track_codec.py"""
+import base64
+
+import numpy as np
+import pytest
+
+from track_codec import MAX_ABS_VALUE, TRACK_FORMAT_VERSION, decode_track, encode_track
+
+LIMITS = {'max_points': 200, 'max_bytes': 4096}
+
+
+def raw_blob(fields, body):
+    return base64.b64encode(bytes((TRACK_FORMAT_VERSION, fields)) + bytes(body)).decode('ascii')
+
+
+@pytest.mark.parametrize('points', [
+    [(0, 0)],
+    [(10, 75), (12, 74), (15, 76), (15, 76)],
+    [(10, 75, 1_700_000_000_000), (9, 80, 1_700_000_000_016), (-3, -7, 1_700_000_000_020)],
+])
+def test_round_trip(points):
+    fields = len(points[0])
+    decoded = decode_track(encode_track(points), fields, **LIMITS)
+    assert decoded.dtype == np.int64
+    assert decoded.tolist() == [list(point) for point in points]
+
+
+def test_random_round_trip():
+    rng = np.random.default_rng(20240601)
+    for _ in range(50):
+        points = np.cumsum(rng.integers(-300, 300, size=(rng.integers(1, 200), 3)), axis=0)
+        assert np.array_equal(decode_track(encode_track(points), 3, **LIMITS), points)
+
+
+def test_zigzag_maps_small_negatives_to_small_varints():
+    # 点数 1，随后 zigzag(-1) = 1、zigzag(1) = 2，每个值一个字节
+    assert base64.b64decode(encode_track([(-1, 1)])) == bytes((TRACK_FORMAT_VERSION, 2, 1, 1, 2))
+    assert decode_track(raw_blob(2, [1, 1, 2]), 2, **LIMITS).tolist() == [[-1, 1]]
+    # zigzag(-64) = 127 仍是一个字节，zigzag(64) = 128 需要两个字节
+    assert base64.b64decode(encode_track([(-64, 64)]))[2:] == bytes((1, 127, 0x80, 0x01))
+
+
+def test_coordinates_near_the_limit():
+    big = MAX_ABS_VALUE - 1
+    assert decode_track(encode_track([(big, -big)]), 2, **LIMITS).tolist() == [[big, -big]]
+    with pytest.raises(ValueError, match='超出范围'):
+        decode_track(encode_track([(MAX_ABS_VALUE, 0)]), 2, **LIMITS)
+    # 单步差值都在范围内，累加后超出
+    with pytest.raises(ValueError, match='超出范围'):
+        decode_track(encode_track([(big, 0), (2 * big, 0)]), 2, **LIMITS)
+
+
+def test_truncated_input():
+    data = base64.b64decode(encode_track([(300, 400), (1000, 2000)]))
+    # 截在 varint 中间
+    with pytest.raises(ValueError, match='不完整'):
+        decode_track(base64.b64encode(data[:-1]).decode('ascii'), 2, **LIMITS)
+    # 截在 varint 边界，点数与数据不符
+    with pytest.raises(ValueError, match='不符'):
+        decode_track(raw_blob(2, [2, 1, 1]), 2, **LIMITS)
+    with pytest.raises(ValueError, match='格式不匹配'):
+        decode_track(raw_blob(2, []), 2, **LIMITS)
+
+
+def test_varint_overflow():
+    with pytest.raises(ValueError, match='格式错误'):
+        decode_track(raw_blob(2, [1] + [0xFF] * 10 + [0x01] + [0]), 2, **LIMITS)
+
+
+def test_over_limit_counts():
+    points = [(i, i) for i in range(LIMITS['max_points'] + 1)]
+    with pytest.raises(ValueError, match='点过多'):
+        decode_track(encode_track(points), 2, max_points=LIMITS['max_points'], max_bytes=1 << 20)
+    # 声明的点数超限但数据很短：仍按声明的点数拒绝
+    with pytest.raises(ValueError, match='点过多'):
+        decode_track(raw_blob(2, [0xFF, 0xFF, 0x03, 1, 1]), 2, **LIMITS)
+    with pytest.raises(ValueError, match='过大'):
+        decode_track(encode_track(points), 2, max_points=1000, max_bytes=64)
+
+
+@pytest.mark.parametrize('blob, fields', [
+    (None, 2),
+    ('not base64!', 2),
+    (raw_blob(3, [1, 0, 0, 0]), 2),
+    (base64.b64encode(bytes((TRACK_FORMAT_VERSION + 1, 2, 1, 0, 0))).decode('ascii'), 2),
+])
+def test_malformed_input(blob, fields):
+    with pytest.raises(ValueError):
+        decode_track(blob, fields, **LIMITS)
@@ -0,0 +1,100 @@
+"""验证信息存储的单元测试：python -m pytest benchmarks/test_verification_store.py"""
+import time
+
+from verification_store import VerificationStore
+
+class Record:
+    __slots__ = ('params', 'start_time')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.params = None
+        self.start_time = 0.0
+
+
+def make_store(capacity=4, ttl=10):
+    """返回存储和当前时间；get() 按当前时间推进时钟，分配时间也取当前时间"""
+    return VerificationStore(capacity, ttl, Record), time.time()
+
+
+def test_get_returns_allocated_record():
+    store, now = make_store()
+    verify_id, record = store.allocate({'x': 1}, now=now)
+    assert store.get(verify_id) is record
+    assert record.params == {'x': 1} and record.start_time == now
+
+
+def test_invalid_ids_are_rejected():
+    store, now = make_store()
+    verify_id, _ = store.allocate('a', now=now)
+    for bad in [None, '', 'abc', '-1', str(int(verify_id) + 1), str(int(verify_id) ^ (1 << 40))]:
+        assert store.get(bad) is None
+
+
+def test_stale_id_rejected_after_slot_reuse():
+    store, now = make_store()
+    old_id, _ = store.allocate('old', now=now)
+    assert store.free(old_id)
+    assert not store.free(old_id)
+    # 空闲槽位用栈管理，刚释放的槽位立即被复用，但代数已经改变
+    new_id, record = store.allocate('new', now=now)
+    assert new_id != old_id
+    assert int(new_id) & 0b11 == int(old_id) & 0b11
+    assert store.get(old_id) is None
+    assert store.get(new_id) is record and record.params == 'new'
+
+
+def test_records_expire_through_the_wheel():
+    store, now = make_store(ttl=10)
+    early_id, _ = store.allocate('early', now=now)
+    late_id, _ = store.allocate('late', now=now + 5)
+    store._advance(now + 9)
+    assert store.stats()['expired'] == 0
+    store._advance(now + 11)
+    assert store._parse_id(early_id) is None and store._parse_id(late_id) is not None
+    store._advance(now + 16)
+    assert store._parse_id(late_id) is None
+    assert store.stats()['expired'] == 2 and len(store) == 0
+
+
+def test_advance_past_a_full_turn_expires_everything():
+    store, now = make_store(ttl=10)
+    ids = [store.allocate(i, now=now + i)[0] for i in range(4)]
+    store._advance(now + 1000)
+    assert all(store._parse_id(verify_id) is None for verify_id in ids)
+    assert store.stats()['expired'] == 4 and store.stats()['wheel_entries'] == 0
+
+
+def test_full_store_evicts_the_earliest_expiring_record():
+    store, now = make_store(capacity=3, ttl=10)
+    ids = [store.allocate(i, now=now + i)[0] for i in range(3)]
+    newest_id, _ = store.allocate('new', now=now + 3)
+    assert store._parse_id(ids[0]) is None
+    assert all(store._parse_id(verify_id) is not None for verify_id in ids[1:] + [newest_id])
+    stats = store.stats()
+    assert stats['evicted'] == 1 and stats['occupancy'] == 3
+
+
+def test_eviction_skips_freed_records():
+    store, now = make_store(capacity=3, ttl=10)
+    ids = [store.allocate(i, now=now + i)[0] for i in range(3)]
+    store.free(ids[0])
+    store.allocate('a', now=now + 3)
+    # 槽位来自空闲栈，不淘汰；再分配时淘汰的是仍有效的最早记录 ids[1]
+    assert store.stats()['evicted'] == 0
+    store.allocate('b', now=now + 3)
+    assert store.stats()['evicted'] == 1
+    assert store._parse_id(ids[1]) is None and store._parse_id(ids[2]) is not None
+
+
+def test_wheel_entries_stay_bounded_when_records_are_freed():
+    store, now = make_store(capacity=8, ttl=60)
+    for i in range(10000):
+        verify_id, _ = store.allocate(i, now=now)
+        store.free(verify_id)
+    stats = store.stats()
+    assert stats['wheel_entries'] <= 2 * store.capacity + 1
+    assert sum(len(bucket) for bucket in store._wheel) == stats['wheel_entries']
+    assert stats['occupancy'] == 0 and stats['freed'] == 10000
@@ -0,0 +1,136 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+class CaptchaPool:
+    """预渲染验证码池：后台线程补充，池大小随请求速率自适应"""
+
+    def __init__(self, name, producer, min_size=4, max_size=64, refill_horizon=2.0, rate_window=10.0, workers=1):
+        self.name = name
+        self.producer = producer          # 生成一个验证码（图片字节及答案数据）的函数
+        self.min_size = min_size          # 池最小目标大小
+        self.max_size = max_size          # 池容量上限
+        self.refill_horizon = refill_horizon  # 按多少秒的请求量预渲染（秒）
+        self.rate_window = rate_window    # 请求速率的指数衰减时间常数（秒）
+        self.workers = workers            # 补充线程数量
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._pid = None
+        self._stopped = False
+
+        # 请求速率估计（指数衰减计数）
+        self._rate = 0.0
+        self._rate_time = time.monotonic()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.produced = 0
+        self.errors = 0
+
+    def start(self):
+        """启动补充线程（fork 后在新进程中重新启动）"""
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            # fork 出的子进程不会继承线程，丢弃父进程的状态重新开始
+            self._pid = os.getpid()
+            self._items.clear()
+            self._stopped = False
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'captcha-pool-{self.name}-{i}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self):
+        """停止补充线程"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _running(self):
+        # fork 出的子进程中父进程留下的条目不能再发出（会和父进程发出同一个验证码），视为未启动
+        return self._pid == os.getpid() and not self._stopped
+
+    def take(self):
+        """取出一个预渲染的验证码，池为空或补充线程未启动时返回 None
+
+        补充线程只由启动阶段的 start() 创建，不在请求线程中创建（见 3in1.start_background_work）。
+        """
+        with self._cond:
+            self._record_request(time.monotonic())
+            if self._running() and self._items:
+                item = self._items.popleft()
+                self.hits += 1
+            else:
+                item = None
+                self.misses += 1
+            self._cond.notify()
+        return item
+
+    def _record_request(self, now):
+        self._rate = self._decayed_rate(now) + 1.0 / self.rate_window
+        self._rate_time = now
+
+    def _decayed_rate(self, now):
+        return self._rate * math.exp(-(now - self._rate_time) / self.rate_window)
+
+    def target_size(self):
+        """根据观测到的请求速率计算目标池大小"""
+        wanted = math.ceil(self._decayed_rate(time.monotonic()) * self.refill_horizon)
+        return max(self.min_size, min(self.max_size, wanted))
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            with self._cond:
+                while not self._stopped and len(self._items) >= self.target_size():
+                    # 超时唤醒，以便速率衰减后重新计算目标大小
+                    self._cond.wait(timeout=1.0)
+                if self._stopped:
+                    return
+
+            try:
+                item = self.producer()
+            except Exception:
+                with self._cond:
+                    self.errors += 1
+                # 生成失败（如字体缺失）时退避，避免空转
+                backoff = min(backoff * 2 or 0.1, 5.0)
+                time.sleep(backoff)
+                continue
+            backoff = 0.0
+
+            with self._cond:
+                if len(self._items) < self.max_size:
+                    self._items.append(item)
+                    self.produced += 1
+
+    def state(self):
+        """池状态：not_started（本进程未调用 start）、stopped、filling（空）或 ready"""
+        if self._pid != os.getpid():
+            return 'not_started'
+        if self._stopped:
+            return 'stopped'
+        return 'ready' if self._items else 'filling'
+
+    def stats(self):
+        """返回池的填充情况"""
+        with self._cond:
+            return {
+                'state': self.state(),
+                'size': len(self._items) if self._running() else 0,
+                'target': self.target_size(),
+                'max_size': self.max_size,
+                'rate': round(self._decayed_rate(time.monotonic()), 3),
+                'hits': self.hits,
+                'misses': self.misses,
+                'produced': self.produced,
+                'errors': self.errors,
+            }
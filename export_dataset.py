@@ -0,0 +1,208 @@
+"""离线导出带标注的验证码数据集
+
+    python export_dataset.py math -n 1000000 -o dataset/math -j 8
+    python export_dataset.py slide --start 50000 -n 10000 -o dataset/slide --format npz
+
+直接调用 generate_captcha、generate_captcha_image 和 CaptchaGenerator.generate，不经过 HTTP 接口。
+样本 i 的随机种子为 seed + i，相同参数重复导出得到完全相同的图片和标注。
+- tar：每个样本一组同名文件（<种子>.png 或 <种子>.bg.png/<种子>.gap.png，以及 <种子>.json 标注）
+- npz：每个分片一个文件，图片按名称堆叠为 uint8 数组，另有 seeds 和 labels（JSON 字符串）
+每个分片先写临时文件再原子改名；中断后用相同参数重新运行，已完成的分片会被跳过（断点续传）。
+"""
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tarfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+KINDS = ('math', 'word', 'slide')
+FORMATS = ('tar', 'npz')
+# 决定样本内容的参数，续传时必须与已有的 manifest.json 一致
+MANIFEST_KEYS = ('kind', 'seed', 'start', 'count', 'shard_size', 'format', 'compress_level')
+
+captcha = None  # 当前进程加载的 3in1 模块
+
+
+def load_captcha():
+    """加载 3in1.py（字体和背景路径相对仓库根目录）"""
+    global captcha
+    if captcha is None:
+        os.chdir(ROOT)
+        if ROOT not in sys.path:
+            sys.path.insert(0, ROOT)
+        captcha = importlib.import_module('3in1')
+    return captcha
+
+
+def make_sample(kind, seed):
+    """按种子生成一个样本，返回 ({图片名: PIL 图片}, 标注)"""
+    random.seed(seed)
+    if kind == 'math':
+        img, answer = captcha.generate_captcha()
+        return {'image': img}, {'seed': seed, 'answer': answer}
+    if kind == 'word':
+        hanzi_list = captcha.generate_hanzi_list()
+        img, shuffled_hanzi_list, positions = captcha.generate_captcha_image(hanzi_list)
+        return {'image': img}, {'seed': seed, 'hanzi_list': hanzi_list,
+                                'shuffled_hanzi_list': shuffled_hanzi_list, 'positions': positions}
+    result = captcha.captcha_generator.generate()
+    params = result['params']
+    return {'bg': result['bg_image'], 'gap': result['gap_image']}, {
+        'seed': seed,
+        'bg_index': params.bg_index,
+        'gap_x': params.gap_x,
+        'gap_y': params.gap_y,
+        'trap_x': params.trap_x,
+        'trap_y': params.trap_y,
+        'gap_width': result['gap_width'],
+        'gap_height': result['gap_height'],
+    }
+
+
+def _add_tar_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = 0  # 内容只由种子决定，便于比较
+    tar.addfile(info, io.BytesIO(data))
+
+
+def write_tar_shard(path, kind, seeds, compress_level):
+    with tarfile.open(path, 'w') as tar:
+        for seed in seeds:
+            images, label = make_sample(kind, seed)
+            for name, img in images.items():
+                buffer = io.BytesIO()
+                img.save(buffer, 'PNG', compress_level=compress_level)
+                suffix = '' if name == 'image' else f'.{name}'
+                _add_tar_member(tar, f'{seed:010d}{suffix}.png', buffer.getvalue())
+            _add_tar_member(tar, f'{seed:010d}.json', json.dumps(label, ensure_ascii=False).encode('utf-8'))
+
+
+def write_npz_shard(path, kind, seeds, compress_level):
+    arrays = {}
+    labels = []
+    for seed in seeds:
+        images, label = make_sample(kind, seed)
+        for name, img in images.items():
+            arrays.setdefault(name, []).append(np.asarray(img))
+        labels.append(json.dumps(label, ensure_ascii=False))
+    arrays = {name: np.stack(values) for name, values in arrays.items()}
+    save = np.savez_compressed if compress_level > 0 else np.savez
+    with open(path, 'wb') as f:
+        save(f, seeds=np.asarray(seeds, dtype=np.int64), labels=np.array(labels), **arrays)
+
+
+def shard_path(output, kind, shard, fmt):
+    return os.path.join(output, f'{kind}-{shard:06d}.{fmt}')
+
+
+def write_shard(task):
+    """子进程中写一个分片，返回 (分片号, 样本数, 字节数, 耗时)"""
+    output, kind, fmt, compress_level, shard, lo, hi = task
+    seeds = range(lo, hi)
+    load_captcha()
+    start = time.perf_counter()
+    path = shard_path(output, kind, shard, fmt)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    writer = write_tar_shard if fmt == 'tar' else write_npz_shard
+    try:
+        writer(tmp_path, kind, seeds, compress_level)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return shard, len(seeds), os.path.getsize(path), time.perf_counter() - start
+
+
+def check_manifest(output, manifest):
+    """首次导出时写入 manifest.json；续传时参数不一致则拒绝，避免混入不同参数的分片"""
+    path = os.path.join(output, 'manifest.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            existing = json.load(f)
+        changed = [key for key in MANIFEST_KEYS if existing.get(key) != manifest[key]]
+        if changed:
+            return f'{output} 中已有参数不同的导出（{", ".join(changed)}），请换一个输出目录'
+        return None
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='离线导出带标注的验证码数据集（分片 tar/npz，多进程，可断点续传）')
+    parser.add_argument('kind', choices=KINDS, help='验证码类型')
+    parser.add_argument('-o', '--output', required=True, help='输出目录')
+    parser.add_argument('-n', '--count', type=int, required=True, help='样本数量')
+    parser.add_argument('--start', type=int, default=0, help='起始样本序号')
+    parser.add_argument('--seed', type=int, default=0, help='基础种子，样本 i 的种子为 seed + i')
+    parser.add_argument('--shard-size', type=int, default=10000, help='每个分片的样本数')
+    parser.add_argument('--format', choices=FORMATS, default='tar', help='分片格式')
+    parser.add_argument('--compress-level', type=int, default=1,
+                        help='tar 中 PNG 的压缩级别（0-9）；npz 大于 0 时使用 savez_compressed')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='并行进程数')
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    os.makedirs(output, exist_ok=True)
+    manifest = {key: getattr(args, key) for key in MANIFEST_KEYS}
+    error = check_manifest(output, manifest)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+
+    # 先在主进程加载一次，字体缺失等问题立即报错；fork 出的子进程直接继承
+    load_captcha()
+    if args.kind == 'word':
+        try:
+            captcha.get_hanzi_atlas()
+        except OSError as e:
+            print(f'无法加载汉字字体: {e}', file=sys.stderr)
+            return 1
+
+    first = args.seed + args.start
+    shards = (args.count + args.shard_size - 1) // args.shard_size
+    tasks = []
+    skipped = 0
+    for shard in range(shards):
+        if os.path.exists(shard_path(output, args.kind, shard, args.format)):
+            skipped += 1
+            continue
+        lo = first + shard * args.shard_size
+        hi = first + min(args.count, (shard + 1) * args.shard_size)
+        tasks.append((output, args.kind, args.format, args.compress_level, shard, lo, hi))
+    if skipped:
+        print(f'跳过已完成的 {skipped} 个分片', file=sys.stderr)
+
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    start = time.perf_counter()
+    samples = total_bytes = busy = 0
+    with context.Pool(max(1, args.jobs), initializer=load_captcha) as pool:
+        for done, (shard, count, size, seconds) in enumerate(pool.imap_unordered(write_shard, tasks), 1):
+            samples += count
+            total_bytes += size
+            busy += seconds
+            elapsed = time.perf_counter() - start
+            print(f'[{done}/{len(tasks)}] 分片 {shard}: {count} 个样本 {seconds:.1f}s | 累计 {samples} 个，'
+                  f'{samples / elapsed:.0f} 个/秒，{total_bytes / 1e6:.1f} MB', file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    if samples:
+        print(f'导出 {samples} 个 {args.kind} 样本到 {output}: {elapsed:.1f}s，{samples / elapsed:.0f} 个/秒'
+              f'（{args.jobs} 进程，单进程 {samples / busy:.0f} 个/秒），{total_bytes / 1e6:.1f} MB，'
+              f'平均 {total_bytes / samples / 1024:.1f} KB/样本')
+    else:
+        print(f'{output} 中的 {shards} 个分片均已完成')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
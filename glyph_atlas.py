@@ -0,0 +1,150 @@
+import os
+import threading
+import zlib
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+class GlyphAtlas:
+    """预光栅化的字形图集：启动时渲染一次字形遮罩和步进宽度，绘制时只做着色粘贴"""
+
+    def __init__(self, font, chars):
+        self.font = font
+        self.masks = {}     # 字符 -> 'L' 遮罩（空白字符为 None）
+        self.offsets = {}   # 字符 -> 遮罩相对绘制原点的偏移
+        self.bboxes = {}    # 字符 -> 相对绘制原点的边界框
+        self.advances = {}  # 字符 -> 步进宽度
+        for char in chars:
+            self._add(char)
+
+    @classmethod
+    def from_truetype(cls, path, size, chars):
+        """加载 TrueType 字体并构建图集，字体不可用时退回默认字体"""
+        try:
+            font = ImageFont.truetype(path, size)
+        except OSError:
+            font = ImageFont.load_default()
+        return cls(font, chars)
+
+    def _add(self, char):
+        left, top, right, bottom = self.font.getbbox(char)
+        self.bboxes[char] = (left, top, right, bottom)
+        self.offsets[char] = (left, top)
+        self.advances[char] = self.font.getlength(char)
+        if right > left and bottom > top:
+            mask = Image.new('L', (right - left, bottom - top), 0)
+            ImageDraw.Draw(mask).text((-left, -top), char, fill=255, font=self.font)
+            self.masks[char] = mask
+        else:
+            self.masks[char] = None
+
+    def glyph(self, char):
+        """返回字符的遮罩、偏移和步进宽度，图集中没有的字符按需补充"""
+        if char not in self.advances:
+            self._add(char)
+        return self.masks[char], self.offsets[char], self.advances[char]
+
+    def textlength(self, char):
+        """与 ImageDraw.textlength 等价的步进宽度"""
+        return self.glyph(char)[2]
+
+    def textbbox(self, text):
+        """按图集度量计算整段文字的边界框（原点为 (0, 0)）
+
+        逐字累加步进宽度，不含字偶距（kerning）；逐字绘制时同样不做字偶距调整，两者一致，
+        但与 ImageDraw.textbbox 对整段文字的结果可能相差字偶距的宽度。
+        """
+        for char in text:
+            self.glyph(char)
+        x = 0
+        left = top = right = bottom = None
+        for char in text:
+            l, t, r, b = self.bboxes[char]
+            if r > l and b > t:
+                left = x + l if left is None else min(left, x + l)
+                right = x + r if right is None else max(right, x + r)
+                top = t if top is None else min(top, t)
+                bottom = b if bottom is None else max(bottom, b)
+            x += self.advances[char]
+        if left is None:
+            return 0, 0, 0, 0
+        return round(left), round(top), round(right), round(bottom)
+
+    def draw_char(self, draw, xy, char, fill):
+        """在 (x, y) 处按 ImageDraw.text 的定位方式绘制单个字符
+
+        遮罩按整数原点光栅化：整数坐标处与 ImageDraw.text 逐像素相同；小数坐标取最近的整数像素，
+        而 ImageDraw.text 会按小数部分做亚像素渲染，边缘的抗锯齿略有不同。
+        """
+        mask, (left, top), _ = self.glyph(char)
+        if mask is not None:
+            draw.bitmap((round(xy[0]) + left, round(xy[1]) + top), mask, fill=fill)
+
+
+def hanzi_atlas_path(chars, size, directory='.'):
+    """图集文件名包含字号和字符表校验值，字符表或字号变化后自动失效"""
+    checksum = zlib.crc32(''.join(chars).encode('utf-8'))
+    return os.path.join(directory, f'hanzi_atlas_{size}_{checksum:08x}.npy')
+
+
+class HanziAtlas:
+    """定长单元的汉字字形图集：每个字预渲染为 size×size 的灰度位图（白底黑字）
+
+    图集保存为 .npy 文件，后续进程以内存映射方式加载，不再解析字体、不再光栅化。
+    """
+
+    def __init__(self, chars, cells):
+        self.chars = chars
+        self.cells = cells  # uint8 数组，形状 (字数, size, size)
+        self.index = {char: i for i, char in enumerate(chars)}
+
+    @staticmethod
+    def unique_chars(chars):
+        # 字符表中可能有重复字，按首次出现的顺序去重
+        return ''.join(dict.fromkeys(chars))
+
+    @classmethod
+    def build(cls, font, chars, size):
+        """用已加载的字体一次性光栅化全部字形"""
+        chars = cls.unique_chars(chars)
+        cells = np.empty((len(chars), size, size), dtype=np.uint8)
+        for i, char in enumerate(chars):
+            char_img = Image.new('L', (size, size), 255)
+            ImageDraw.Draw(char_img).text((0, 0), char, fill=0, font=font)
+            cells[i] = np.asarray(char_img)
+        return cls(chars, cells)
+
+    @classmethod
+    def load(cls, path, chars, size):
+        """以内存映射方式加载图集文件，形状不符时返回 None"""
+        chars = cls.unique_chars(chars)
+        try:
+            cells = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        if cells.shape != (len(chars), size, size) or cells.dtype != np.uint8:
+            return None
+        return cls(chars, cells)
+
+    @classmethod
+    def load_or_build(cls, path, font_path, chars, size):
+        """优先加载已保存的图集，不存在时加载一次字体构建并保存"""
+        atlas = cls.load(path, chars, size)
+        if atlas is None:
+            atlas = cls.build(ImageFont.truetype(font_path, size), chars, size)
+            atlas.save(path)
+            atlas = cls.load(path, chars, size) or atlas
+        return atlas
+
+    def save(self, path):
+        """先写临时文件再原子替换，避免多个进程同时启动时读到半个文件"""
+        # 临时文件名带进程号和线程号，同时构建的进程或线程不会写同一个文件
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.cells))
+        os.replace(tmp_path, path)
+
+    def image(self, char):
+        """返回字符的灰度位图"""
+        return Image.fromarray(self.cells[self.index[char]])
@@ -0,0 +1,19 @@
+"""gunicorn 配置：gunicorn -c gunicorn.conf.py 3in1:app
+
+每个 worker 进程加载应用后调用 start_background_work()，创建渲染进程池并启动预渲染池的补充线程；
+不使用此钩子时 CAPTCHA_RENDER_PROCESSES 不生效（渲染退回同步执行并给出警告），
+预渲染池也不会启动（/ready 中池状态为 not_started）。
+"""
+import importlib
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+
+def post_worker_init(worker):
+    # 此时应用已在 worker 进程中加载，请求线程尚未创建（gthread 的线程池在此钩子之后才启动）
+    importlib.import_module('3in1').start_background_work()
+
+
+def worker_exit(server, worker):
+    importlib.import_module('3in1').stop_background_work()
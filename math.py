@@ -1,10 +1,11 @@
 from flask import Flask, request, session, send_file
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import random
 import io
 from datetime import datetime, timedelta
 import time
 from collections import defaultdict
+from glyph_atlas import GlyphAtlas
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'
@@ -17,6 +18,10 @@ NOISE_POINTS = 100  # 噪点数量增加
 FONT_SIZE = 20  # 字体放大
 LINE_NUM = 3  # 干扰线数量增加
 
+# 启动时预光栅化算式用到的全部字形（数字、运算符和空格）
+GLYPH_CHARS = '0123456789+-×÷ '
+glyph_atlas = GlyphAtlas.from_truetype("arial.ttf", FONT_SIZE, GLYPH_CHARS)
+
 def generate_math_expression():
     operators = ['+', '-', '×', '÷']
     op = random.choice(operators)
@@ -55,40 +60,29 @@ def generate_captcha():
         b = 255 - int(15 * y/IMG_HEIGHT)
         draw.line([(0, y), (IMG_WIDTH, y)], fill=(r, g, b))
 
-    try:
-        font = ImageFont.truetype("arial.ttf", FONT_SIZE)
-    except:
-        font = ImageFont.load_default()
-        char_spacing = FONT_SIZE * 0.8
-    else:
-        bbox = draw.textbbox((0,0), expression, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        char_spacing = FONT_SIZE * 0.5
+    # 字形度量和遮罩均来自启动时构建的图集
+    bbox = glyph_atlas.textbbox(expression)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
 
-    x = (IMG_WIDTH - text_width) // 2 if font else (IMG_WIDTH - len(expression)*char_spacing) // 2
-    y = (IMG_HEIGHT - text_height) // 2 if font else (IMG_HEIGHT - FONT_SIZE) // 2
+    x = (IMG_WIDTH - text_width) // 2
+    y = (IMG_HEIGHT - text_height) // 2
 
     # 绘制带阴影的文字
     for i, char in enumerate(expression):
-        if font:
-            char_width = draw.textlength(char, font=font)
-        else:
-            char_width = char_spacing
+        char_width = glyph_atlas.textlength(char)
         
         # 文字阴影（减小偏移量和透明度）
         shadow_offset = 1  # 从2减小到1
-        draw.text((x + shadow_offset + random.randint(-2,2),  # 减小随机偏移范围
-                  y + shadow_offset + random.randint(-1,1)),
-                  char, fill=(180,180,180),  # 调亮阴影颜色
-                  font=font)
+        glyph_atlas.draw_char(draw, (x + shadow_offset + random.randint(-2,2),  # 减小随机偏移范围
+                                     y + shadow_offset + random.randint(-1,1)),
+                              char, fill=(180,180,180))  # 调亮阴影颜色
         
         # 主文字
-        draw.text((x + random.randint(-3,3), 
-                  y + random.randint(-2,2)),
-                  char,
-                  fill=(random.randint(0,100), random.randint(0,100), random.randint(0,100)),
-                  font=font)
+        glyph_atlas.draw_char(draw, (x + random.randint(-3,3), 
+                                     y + random.randint(-2,2)),
+                              char,
+                              fill=(random.randint(0,100), random.randint(0,100), random.randint(0,100)))
         x += char_width + random.randint(8,12)
 
     # 添加曲线干扰线
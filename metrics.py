@@ -0,0 +1,205 @@
+import bisect
+import os
+import threading
+import time
+import weakref
+
+# 阶段耗时的默认分桶（秒），覆盖 50 微秒到 2.5 秒
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+# 带锁的指标；fork 出的子进程（如渲染进程）中重建锁，避免继承 fork 时被其他线程持有的锁
+_locked_metrics = weakref.WeakSet()
+
+
+def _reset_locks():
+    for metric in list(_locked_metrics):
+        metric._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """单调递增计数器，按标签值分别计数"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _locked_metrics.add(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name + '_total', _format_labels(self.labelnames, labels), value
+
+
+class Gauge:
+    """抓取时调用 callback 取值；callback 返回数值，或 {标签值元组: 数值}"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), callback=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self):
+        result = self.callback()
+        items = result.items() if isinstance(result, dict) else [((), result)]
+        for labels, value in sorted(items):
+            if value is not None:
+                yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class CallbackCounter(Gauge):
+    """抓取时调用 callback 取累计值（由存储、限流表等自己维护的单调计数），按计数器类型输出"""
+
+    kind = 'counter'
+
+    def samples(self):
+        for name, labels, value in super().samples():
+            yield name + '_total', labels, value
+
+
+class Histogram:
+    """固定分桶直方图：observe 只做一次二分查找和两次加法"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # 标签值 -> [各桶计数..., +Inf 桶计数, 总和]
+        self._lock = threading.Lock()
+        _locked_metrics.add(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels):
+        """计时上下文管理器：with histogram.time('math', 'draw'): ..."""
+        return Timer(self, labels)
+
+    def stages(self, *labels):
+        """分段计时：clock = histogram.stages('math'); ...; clock.lap('draw')，每段耗时记为一个阶段"""
+        return StageClock(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        bounds = self.buckets + (float('inf'),)
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield (self.name + '_bucket',
+                       _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))]), cumulative)
+            yield self.name + '_sum', _format_labels(self.labelnames, labels), series[-1]
+            yield self.name + '_count', _format_labels(self.labelnames, labels), cumulative
+
+
+class Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class StageClock:
+    __slots__ = ('histogram', 'labels', 'last')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        """记录上一次 lap（或创建）以来的耗时"""
+        now = time.perf_counter()
+        self.histogram.observe(now - self.last, *self.labels, stage)
+        self.last = now
+
+
+class Registry:
+    """指标注册表，render() 输出 Prometheus 文本格式（每个进程各自统计）"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=(), callback=None):
+        """给出 callback 时抓取时取值（见 CallbackCounter），否则返回用 inc() 计数的 Counter"""
+        if callback is not None:
+            return self._register(CallbackCounter(name, help_text, labelnames, callback))
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), callback=None):
+        return self._register(Gauge(name, help_text, labelnames, callback))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            name = metric.name + '_total' if metric.kind == 'counter' else metric.name
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            try:
+                for sample_name, labels, value in metric.samples():
+                    lines.append(f'{sample_name}{labels} {_format_value(value)}')
+            except Exception as e:
+                # 某个指标取值失败不影响其他指标
+                lines.append(f'# {name} 取值失败: {e!r}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,140 @@
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class _ActiveRequest:
+    __slots__ = ('name', 'start', 'stacks')
+
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.stacks = None   # 慢请求模式下采样到的调用栈计数
+
+
+class SamplingProfiler:
+    """采样分析器：定时读取 sys._current_frames()，只采样正在处理请求的线程
+
+    - profile(seconds)：按需采样一段时间，返回合并后的调用栈计数（collapsed stack 格式）
+    - 慢请求模式：后台线程持续采样，请求结束时耗时超过阈值的保留其调用栈，只留最慢的 N 个
+    被采样线程不执行任何额外代码，开销只在采样线程一侧。
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval      # 默认采样间隔（秒）
+        self.max_depth = max_depth    # 单个调用栈最多保留的帧数
+        self._lock = threading.Lock()
+        self._requests = {}           # 线程ID -> _ActiveRequest
+        self._seq = itertools.count()
+
+        # 慢请求模式
+        self.slow_threshold = None    # 耗时阈值（秒），None 表示未开启
+        self.slow_keep = 20
+        self._slow = []               # 最小堆 (耗时, 序号, 记录)，只保留最慢的 slow_keep 个
+        self._slow_thread = None
+        self._slow_stop = threading.Event()
+
+    def request_started(self, name):
+        self._requests[threading.get_ident()] = _ActiveRequest(name, time.perf_counter())
+
+    def request_finished(self):
+        record = self._requests.pop(threading.get_ident(), None)
+        threshold = self.slow_threshold
+        if record is None or threshold is None or not record.stacks:
+            return
+        duration = time.perf_counter() - record.start
+        if duration < threshold:
+            return
+        entry = (duration, next(self._seq), {
+            'name': record.name,
+            'duration_ms': round(duration * 1000, 2),
+            'time': time.time(),
+            'samples': sum(record.stacks.values()),
+            'stacks': record.stacks,
+        })
+        with self._lock:
+            if len(self._slow) < self.slow_keep:
+                heapq.heappush(self._slow, entry)
+            elif duration > self._slow[0][0]:
+                heapq.heapreplace(self._slow, entry)
+
+    def _frame_label(self, code):
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+    def _stack(self, frame):
+        """把帧链转换为从外到内、以分号分隔的调用栈"""
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._frame_label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ';'.join(labels)
+
+    def _sample(self, exclude=None):
+        """采样一次：返回 [(请求记录, 调用栈)]"""
+        frames = sys._current_frames()
+        samples = []
+        for ident, record in list(self._requests.items()):
+            if ident == exclude:
+                continue
+            frame = frames.get(ident)
+            if frame is not None:
+                samples.append((record, self._stack(frame)))
+        return samples
+
+    def profile(self, seconds, interval=None):
+        """在调用线程中采样 seconds 秒，返回 (调用栈计数, 采样次数)"""
+        interval = interval or self.interval
+        me = threading.get_ident()
+        stacks = Counter()
+        ticks = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for record, stack in self._sample(exclude=me):
+                stacks[f'{record.name};{stack}'] += 1
+            ticks += 1
+            time.sleep(interval)
+        return stacks, ticks
+
+    def start_slow_mode(self, threshold, keep=20, interval=None):
+        """开启慢请求模式：耗时不小于 threshold 秒的请求保留调用栈"""
+        self.stop_slow_mode()
+        with self._lock:
+            self.slow_threshold = threshold
+            self.slow_keep = keep
+            self._slow = []
+        self._slow_stop.clear()
+        self._slow_thread = threading.Thread(target=self._slow_loop, args=(interval or self.interval,),
+                                             name='slow-request-sampler', daemon=True)
+        self._slow_thread.start()
+
+    def stop_slow_mode(self):
+        """关闭慢请求模式，已保留的记录不清除"""
+        self.slow_threshold = None
+        thread = self._slow_thread
+        if thread is not None:
+            self._slow_stop.set()
+            thread.join()
+            self._slow_thread = None
+
+    def _slow_loop(self, interval):
+        while not self._slow_stop.wait(interval):
+            for record, stack in self._sample():
+                if record.stacks is None:
+                    record.stacks = Counter()
+                record.stacks[stack] += 1
+
+    def slow_profiles(self):
+        """返回保留的慢请求记录，按耗时从慢到快排序"""
+        with self._lock:
+            entries = sorted(self._slow, reverse=True)
+        return [record for _, _, record in entries]
+
+
+def collapse(stacks):
+    """输出 collapsed stack 文本（每行“栈 次数”），可直接交给 flamegraph.pl / speedscope"""
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
@@ -0,0 +1,230 @@
+import argparse
+import functools
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from flask import request
+
+try:
+    import fcntl
+except ImportError:  # Windows 上没有 fcntl，退化为进程内锁
+    fcntl = None
+
+# 每个槽位：键哈希、当前窗口编号、上一窗口计数、当前窗口计数、最后访问时间
+SLOT_DTYPE = np.dtype([('key', '<u8'), ('window', '<i8'), ('prev', '<u4'), ('curr', '<u4'), ('touched', '<f8')])
+
+
+def shared_memory_name(root, port=None):
+    """限流表的共享内存名：优先取 CAPTCHA_RATE_LIMIT_SHM，否则由应用目录和端口（PORT）生成，
+    同一部署的 worker 共享一张表，同一台机器上的其他部署互不影响"""
+    name = os.environ.get('CAPTCHA_RATE_LIMIT_SHM')
+    if name:
+        return name
+    port = os.environ.get('PORT', 5000) if port is None else port
+    digest = hashlib.blake2b(f'{os.path.abspath(root)}\0{port}'.encode('utf-8'), digest_size=6).hexdigest()
+    return f'captcha_rl_{digest}'
+
+
+class SharedRateLimiter:
+    """滑动窗口限流器，计数表放在 multiprocessing.shared_memory 中，所有 worker 进程共享
+
+    表大小固定（开放寻址哈希表），限流状态的内存占用与客户端数量无关；
+    探测范围内没有空位时淘汰最久未访问的槽位。
+    共享内存在第一次限流时才创建或连接；它在 worker 重启后继续存在，部署下线时用 unlink()
+    或 python rate_limiter.py --unlink 删除。
+    """
+
+    def __init__(self, name, slots=16384, probes=8, stale_after=120):
+        self.name = name
+        self.slots = slots              # 槽位数量
+        self.probes = probes            # 线性探测的最大步数
+        self.stale_after = stale_after  # 超过该时间（秒）未访问的槽位可被复用
+        self._shm = None
+        self.table = None
+
+        # 跨进程互斥：对锁文件加 flock；同一进程内的线程再用线程锁串行化
+        self._thread_lock = threading.Lock()
+        self._lock_path = os.path.join(tempfile.gettempdir(), f'{name}.lock')
+        self._lock_file = None
+        self._lock_pid = None
+
+        # 本进程统计
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _open_shared_memory(name, size):
+        """创建或连接命名共享内存；新建的共享内存由系统清零"""
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name)
+            if shm.size < size:
+                shm.close()
+                raise ValueError(f'共享内存 {name} 大小不足，请先清理旧的限流表')
+        # 限流表需要在 worker 重启后继续存在，不交给 resource_tracker 在进程退出时删除
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+    def _attach(self):
+        """首次使用时创建或连接共享内存（调用方持有线程锁）"""
+        if self._shm is None:
+            self._shm = self._open_shared_memory(self.name, self.slots * SLOT_DTYPE.itemsize)
+            self.table = np.ndarray((self.slots,), dtype=SLOT_DTYPE, buffer=self._shm.buf)
+
+    def _acquire(self):
+        self._thread_lock.acquire()
+        try:
+            self._attach()
+        except Exception:
+            self._thread_lock.release()
+            raise
+        if fcntl is not None:
+            if self._lock_file is None or self._lock_pid != os.getpid():
+                self._lock_file = open(self._lock_path, 'a')
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+    def _release(self):
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    @staticmethod
+    def _hash(scope, client):
+        digest = hashlib.blake2b(f'{scope}\0{client}'.encode('utf-8'), digest_size=8).digest()
+        # 0 表示空槽位
+        return int.from_bytes(digest, 'little') or 1
+
+    def _find_slot(self, key, now):
+        """在探测范围内查找键所在槽位，找不到时复用空槽位、过期槽位或最久未访问的槽位"""
+        table = self.table
+        start = key % self.slots
+        free_index = None
+        oldest_index = None
+        oldest_touched = None
+        for i in range(self.probes):
+            index = (start + i) % self.slots
+            slot_key = int(table['key'][index])
+            if slot_key == key:
+                return index
+            touched = float(table['touched'][index])
+            if slot_key == 0 or now - touched > self.stale_after:
+                if free_index is None:
+                    free_index = index
+            elif oldest_index is None or touched < oldest_touched:
+                oldest_index, oldest_touched = index, touched
+        if free_index is None:
+            free_index = oldest_index
+            self.evictions += 1
+        table[free_index] = (key, 0, 0, 0, now)
+        return free_index
+
+    def hit(self, scope, client, limit, window):
+        """记录一次请求，返回是否允许（滑动窗口：上一窗口计数按重叠比例加权）"""
+        key = self._hash(scope, client)
+        now = time.time()
+        current_window = int(now // window)
+        self._acquire()
+        try:
+            index = self._find_slot(key, now)
+            slot = self.table[index]
+            slot_window = int(slot['window'])
+            if slot_window != current_window:
+                slot['prev'] = slot['curr'] if slot_window == current_window - 1 else 0
+                slot['curr'] = 0
+                slot['window'] = current_window
+            slot['touched'] = now
+
+            elapsed_ratio = (now - current_window * window) / window
+            estimate = int(slot['prev']) * (1 - elapsed_ratio) + int(slot['curr'])
+            if estimate >= limit:
+                self.limited += 1
+                return False
+            slot['curr'] = int(slot['curr']) + 1
+            self.allowed += 1
+            return True
+        finally:
+            self._release()
+
+    def stats(self):
+        """返回限流表占用情况和本进程的计数（尚未使用时不创建共享内存）"""
+        table, shm = self.table, self._shm
+        active = 0
+        if table is not None:
+            active = np.count_nonzero((table['key'] != 0) & (time.time() - table['touched'] <= self.stale_after))
+        return {
+            'slots': self.slots,
+            'active': int(active),
+            'bytes': shm.size if shm is not None else 0,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'evictions': self.evictions,
+        }
+
+    def unlink(self):
+        """删除共享内存（部署下线时调用），返回共享内存是否存在
+
+        已连接的进程仍使用原来的映射，之后新连接的进程会得到一张新表，两者的计数互不相通，
+        因此删除后要重启全部 worker。锁文件保留：仍在运行的 worker 持有它的 flock，
+        删除后新进程会在另一个 inode 上加锁，与旧进程失去互斥。
+        """
+        with self._thread_lock:
+            # 按名字另开一个句柄删除（会登记到 resource_tracker，unlink 时取消），本进程已有的映射不受影响；
+            # 已被删除时（包括本进程重复调用）返回 False
+            try:
+                shm = shared_memory.SharedMemory(name=self.name)
+            except FileNotFoundError:
+                return False
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                return False
+            finally:
+                shm.close()
+        return True
+
+
+def rate_limit(limiter, scope, limit, window):
+    """按客户端IP限流的视图装饰器，scope 区分不同蓝图的配额"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not limiter.hit(scope, request.remote_addr, limit, window):
+                return "请求过于频繁，请稍后再试", 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def main(argv=None):
+    """命令行：python rate_limiter.py --unlink，删除本目录部署的限流表（--name 指定其他表）"""
+    parser = argparse.ArgumentParser(description='查看或删除验证码服务的限流表共享内存')
+    parser.add_argument('--name', default=shared_memory_name(os.path.dirname(os.path.abspath(__file__))),
+                        help='共享内存名（默认与同目录、同 PORT 的 3in1.py 相同）')
+    parser.add_argument('--unlink', action='store_true', help='删除共享内存（之后需重启全部 worker）')
+    args = parser.parse_args(argv)
+
+    if not args.unlink:
+        print(args.name)
+        return 0
+    if SharedRateLimiter(args.name).unlink():
+        print(f'已删除限流表 {args.name}')
+        return 0
+    print(f'限流表 {args.name} 不存在', file=sys.stderr)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import random
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+
+def _init_worker(warmup):
+    """子进程初始化：重新播种随机数（fork 出的进程继承了相同的随机状态），预加载字体和背景"""
+    random.seed()
+    if warmup is not None:
+        try:
+            warmup()
+        except Exception:
+            # 预加载失败时在首次渲染时再加载，不让整个进程池不可用
+            pass
+
+
+class RenderExecutor:
+    """验证码渲染进程池：渲染和 PNG 编码在子进程中执行，不受请求进程 GIL 的限制
+
+    processes 为 0 时在调用线程中同步执行。进程池只由 start() 在单线程的启动阶段创建；未启动、
+    排队的任务达到 max_pending、等待超时或进程池不可用时回退为同步执行，请求不会因为进程池出错而失败。
+    任务本身抛出的异常计入 errors 后原样抛给调用方。
+    任务函数和参数需可 pickle（模块级函数），返回值应是编码后的字节和答案数据。
+    """
+
+    def __init__(self, processes=0, warmup=None, max_pending=None, timeout=10.0):
+        self.processes = processes      # 子进程数量，0 表示同步执行
+        self.warmup = warmup            # 子进程启动时调用的预加载函数
+        self.max_pending = max_pending if max_pending is not None else processes * 4
+        self.timeout = timeout          # 等待子进程结果的超时（秒）
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._warned_pid = None         # 已提示过“进程池未启动”的进程
+        self.pending = 0                # 已提交、尚未结束的任务数（队列深度，含超时后仍在运行的任务）
+
+        # 统计
+        self.submitted = 0
+        self.completed = 0
+        self.inline = 0                 # 同步执行的任务数（含回退）
+        self.fallbacks = 0              # 因队列已满、超时或进程池出错而回退的次数
+        self.errors = 0                 # 超时、进程池出错和任务抛出异常的次数
+
+    def start(self):
+        """创建进程池（fork 后在新进程中重新创建）
+
+        fork 时只复制调用线程，其他线程持有的锁在子进程中永远不会释放，因此只能在启动阶段、
+        创建任何其他线程（补充线程、请求线程池）之前调用；请求路径上不会创建进程池。
+        """
+        if self.processes <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # fork 方式启动时子进程直接继承父进程已加载的字体和背景
+            context = (multiprocessing.get_context('fork')
+                       if 'fork' in multiprocessing.get_all_start_methods() else None)
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=context,
+                                             initializer=_init_worker, initargs=(self.warmup,))
+            self._pid = os.getpid()
+        # 提交空任务，让子进程立即启动并完成预加载
+        self._pool.submit(int).result()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool, self._pid = self._pool, None, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, *args):
+        """执行 func(*args)，返回 (结果, 执行方式)；执行方式为 'process'、'inline' 或 'fallback'"""
+        if self.processes <= 0:
+            self.inline += 1
+            return func(*args), 'inline'
+
+        with self._lock:
+            pool = self._pool if self._pid == os.getpid() else None
+            if pool is None or self.pending >= self.max_pending:
+                pool = None
+            else:
+                self.pending += 1
+                self.submitted += 1
+        if pool is None:
+            if self._pid != os.getpid() and self._warned_pid != os.getpid():
+                self._warned_pid = os.getpid()
+                warnings.warn(f'渲染进程池在进程 {os.getpid()} 中没有启动（processes={self.processes}），'
+                              f'渲染改为同步执行；请在 worker 启动时调用 start_background_work()',
+                              RuntimeWarning, stacklevel=2)
+            return self._fallback(func, args)
+
+        try:
+            future = pool.submit(func, *args)
+        except (BrokenProcessPool, RuntimeError):
+            self._release_slot()
+            self._discard(pool)
+            return self._fallback(func, args, error=True)
+        # 任务结束（完成、出错或被取消）时才归还队列名额，超时后仍在子进程中运行的任务继续计入
+        future.add_done_callback(self._release_slot)
+        try:
+            result = future.result(self.timeout)
+        except TimeoutError:
+            # 尚在排队的任务被取消，不会再执行；已在子进程中运行的无法中断，会与同步执行各跑一次
+            future.cancel()
+            return self._fallback(func, args, error=True)
+        except BrokenProcessPool:
+            self._discard(pool)
+            return self._fallback(func, args, error=True)
+        except Exception:
+            # 任务本身抛出的异常，同步重试也会同样失败
+            self.errors += 1
+            raise
+        self.completed += 1
+        return result, 'process'
+
+    def _release_slot(self, future=None):
+        with self._lock:
+            self.pending -= 1
+
+    def _discard(self, pool):
+        """子进程异常退出：丢弃进程池，之后同步执行（不在请求线程中重新 fork，重启 worker 后恢复）"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fallback(self, func, args, error=False):
+        self.fallbacks += 1
+        self.inline += 1
+        if error:
+            self.errors += 1
+        return func(*args), 'fallback'
+
+    def stats(self):
+        return {
+            'processes': self.processes if self._pool is not None else 0,
+            'pending': self.pending,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'inline': self.inline,
+            'fallbacks': self.fallbacks,
+            'errors': self.errors,
+        }
@@ -1,4 +1,5 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify
+import hmac
 from PIL import Image, ImageDraw, ImageFilter
 import random
 import io
@@ -6,12 +7,30 @@ import time
 import math
 import os
 import numpy as np
+from collections import namedtuple
 from datetime import datetime
+from backgrounds import BackgroundCache
+from track_analyzer import TrackAnalyzer
+from verification_store import VerificationStore
 
 app = Flask(__name__)
 
-# 存储验证信息的字典
-verification_data = {}
+# 滑块验证码参数：背景编号、缺口位置和随机种子，足以确定性地重新渲染图片
+SlideParams = namedtuple('SlideParams', 'bg_index gap_x gap_y trap_x trap_y seed')
+
+class SlideEntry:
+    """验证信息存储中预分配的记录：参数记录和首次获取时编码的图片字节"""
+    __slots__ = ('params', 'start_time', 'bg_png', 'gap_png')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """释放时清空记录，供下一个验证码复用"""
+        self.params = None
+        self.start_time = 0.0
+        self.bg_png = None
+        self.gap_png = None
 
 class CaptchaGenerator:
     def __init__(self):
@@ -20,25 +39,21 @@ class CaptchaGenerator:
         self.gap_width = 40   # 缺口宽度
         self.gap_height = 40  # 缺口高度
         self.bg_dir = 'static'  # 背景图片目录
+        self.bg_pack = 'backgrounds.pack'  # 背景资源包（python backgrounds.py static 生成）
         self.expire_time = 30  # 验证码有效期（秒）
+        # 预解码、预缩放的背景图缓存（有资源包时只读资源包，否则监视背景目录的增删）
+        self.bg_cache = BackgroundCache(self.bg_dir, (self.bg_width, self.bg_height), pack_path=self.bg_pack)
 
-    def _get_random_bg_image(self):
-        """随机获取一张背景图片"""
-        bg_files = [f for f in os.listdir(self.bg_dir) if f.endswith(('.png', '.jpg', '.jpeg'))]
-        bg_file = random.choice(bg_files)
-        bg_path = os.path.join(self.bg_dir, bg_file)
-        return Image.open(bg_path).convert('RGBA')
-
-    def _create_gap_area(self, bg_image):
-        """创建真实缺口和陷阱缺口"""
+    def _random_gap_positions(self, rng):
+        """生成真实缺口和陷阱缺口的位置"""
         # 生成真实缺口位置
-        gap_x = random.randint(100, self.bg_width - self.gap_width - 50)
-        gap_y = random.randint(10, self.bg_height - self.gap_height - 10)
+        gap_x = rng.randint(100, self.bg_width - self.gap_width - 50)
+        gap_y = rng.randint(10, self.bg_height - self.gap_height - 10)
 
         # 生成陷阱缺口位置（确保与真实缺口有足够距离且不在同一高度）
         while True:
-            trap_x = random.randint(50, self.bg_width - self.gap_width - 50)
-            trap_y = random.randint(10, self.bg_height - self.gap_height - 10)
+            trap_x = rng.randint(50, self.bg_width - self.gap_width - 50)
+            trap_y = rng.randint(10, self.bg_height - self.gap_height - 10)
             
             # 确保陷阱缺口与真实缺口的距离足够远（至少80像素）且不在同一高度（至少30像素）
             distance = math.sqrt((trap_x - gap_x)**2 + (trap_y - gap_y)**2)
@@ -47,6 +62,12 @@ class CaptchaGenerator:
             if distance >= 80 and height_diff >= 30:
                 break
 
+        return gap_x, gap_y, trap_x, trap_y
+
+    def _create_gap_area(self, bg_image, params):
+        """创建真实缺口和陷阱缺口"""
+        gap_x, gap_y, trap_x, trap_y = params.gap_x, params.gap_y, params.trap_x, params.trap_y
+
         # 创建真实缺口图片
         gap_image = bg_image.crop((gap_x, gap_y, gap_x + self.gap_width, gap_y + self.gap_height))
         
@@ -65,92 +86,65 @@ class CaptchaGenerator:
         # 将遮罩应用到背景图
         bg_image = Image.alpha_composite(bg_image, mask)
         
-        return bg_image, gap_image, gap_x, gap_y, trap_x, trap_y
+        return bg_image, gap_image
+
+    def generate_params(self):
+        """生成验证码参数（只记录背景编号、缺口位置和随机种子，不渲染图片）"""
+        seed = random.getrandbits(32)
+        rng = random.Random(seed)
+        bg_index = self.bg_cache.random_index(rng)
+        if bg_index is None:
+            raise LookupError('没有可用的背景图')
+        gap_x, gap_y, trap_x, trap_y = self._random_gap_positions(rng)
+        return SlideParams(bg_index, gap_x, gap_y, trap_x, trap_y, seed)
+
+    def _get_bg_image(self, params):
+        """按参数中的背景编号取已调整大小的背景图片；背景已被移除时抛出 LookupError，不换成其他背景"""
+        bg_image = self.bg_cache.image(params.bg_index)
+        if bg_image is None:
+            raise LookupError(f'背景 {params.bg_index} 已不可用')
+        return bg_image
+
+    def render(self, params):
+        """按参数确定性地渲染背景图和缺口图"""
+        return self._create_gap_area(self._get_bg_image(params), params)
+
+    def render_bg_image(self, params):
+        """只渲染带遮罩的背景图"""
+        return self.render(params)[0]
+
+    def render_gap_image(self, params):
+        """只渲染缺口图"""
+        bg_image = self._get_bg_image(params)
+        return bg_image.crop((params.gap_x, params.gap_y,
+                              params.gap_x + self.gap_width, params.gap_y + self.gap_height))
 
     def generate(self):
         """生成验证码"""
-        # 获取并调整背景图片大小
-        bg_image = self._get_random_bg_image()
-        bg_image = bg_image.resize((self.bg_width, self.bg_height))
-        
-        # 创建缺口
-        bg_image, gap_image, gap_x, gap_y, trap_x, trap_y = self._create_gap_area(bg_image)
+        params = self.generate_params()
+        bg_image, gap_image = self.render(params)
         
         return {
+            'params': params,
             'bg_image': bg_image,
             'gap_image': gap_image,
-            'gap_x': gap_x,
-            'gap_y': gap_y,
-            'trap_x': trap_x,
-            'trap_y': trap_y,
+            'gap_x': params.gap_x,
+            'gap_y': params.gap_y,
+            'trap_x': params.trap_x,
+            'trap_y': params.trap_y,
             'gap_width': self.gap_width,
             'gap_height': self.gap_height,
             'expire_time': self.expire_time
         }
 
-class TrackAnalyzer:
-    def __init__(self):
-        self.min_track_length = 10     # 最小轨迹点数
-        self.max_speed = 1500          # 最大速度（像素/秒）
-        self.max_deviation = 50        # 最大垂直偏移
-        self.min_y_changes = 3         # 最小Y轴变化次数
-        self.min_y_change = 1          # 最小Y轴变化幅度（像素）
-        self.max_slide_time = 5000     # 最大滑动时间（毫秒）
-        self.min_slide_time = 100      # 最小滑动时间（毫秒）
-
-    def analyze_tracks(self, tracks):
-        """分析鼠标轨迹是否合理"""
-        if len(tracks) < self.min_track_length:
-            return False, "轨迹过短"
-
-        # 计算总滑动时间
-        total_time = tracks[-1]['timestamp'] - tracks[0]['timestamp']
-        if total_time > self.max_slide_time:
-            return False, "滑动时间过长"
-        if total_time < self.min_slide_time:
-            return False, "滑动时间过短"
-
-        # 记录Y轴方向的变化次数
-        y_changes = 0
-        last_y = tracks[0]['y']
-        
-        # 检查速度和Y轴变化
-        for i in range(1, len(tracks)):
-            prev = tracks[i-1]
-            curr = tracks[i]
-            
-            # 计算两点间的时间和距离
-            dt = (curr['timestamp'] - prev['timestamp']) / 1000  # 转换为秒
-            if dt == 0:
-                return False, "移动速度异常"
-                
-            dx = curr['x'] - prev['x']
-            dy = curr['y'] - prev['y']
-            
-            # 计算速度
-            speed = math.sqrt(dx*dx + dy*dy) / dt
-            if speed > self.max_speed:
-                return False, "移动速度过快"
-            
-            # 检查垂直方向的偏移
-            if abs(dy) > self.max_deviation:
-                return False, "垂直移动幅度过大"
-            
-            # 检测Y轴的变化
-            if abs(curr['y'] - last_y) >= self.min_y_change:
-                y_changes += 1
-                last_y = curr['y']
-
-        # 如果Y轴变化次数太少，判定为机器操作
-        if y_changes < self.min_y_changes:
-            return False, "移动轨迹过于平直"
-
-        return True, "轨迹正常"
-
 # 创建验证码生成器和轨迹分析器实例
 captcha_generator = CaptchaGenerator()
 track_analyzer = TrackAnalyzer()
 
+# 存储验证信息（定长存储，只保存参数记录，图片在获取时按参数渲染）
+VERIFY_CAPACITY = 16384  # 最多同时存在的验证码数量
+verification_data = VerificationStore(VERIFY_CAPACITY, captcha_generator.expire_time, SlideEntry)
+
 HTML_TEMPLATE = '''<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -548,54 +542,103 @@ def index():
 @app.route('/get_captcha')
 def get_captcha():
     """获取新的验证码"""
-    # 生成验证码
-    captcha_data = captcha_generator.generate()
+    # 生成验证码参数，图片在首次获取时再渲染
+    try:
+        params = captcha_generator.generate_params()
+    except LookupError:
+        return 'No background available', 503
     
-    # 生成验证ID
-    verify_id = str(random.randint(100000, 999999))
-    
-    # 存储验证信息
-    verification_data[verify_id] = {
-        'bg_image': captcha_data['bg_image'],
-        'gap_image': captcha_data['gap_image'],
-        'gap_x': captcha_data['gap_x'],
-        'gap_y': captcha_data['gap_y'],
-        'trap_x': captcha_data['trap_x'],
-        'trap_y': captcha_data['trap_y'],
-        'start_time': time.time(),
-        'expire_time': captcha_data['expire_time']
-    }
+    # 分配验证ID并存储验证信息（只保存参数记录）
+    verify_id, _ = verification_data.allocate(params)
     
     return jsonify({
         'verify_id': verify_id,
-        'gap_x': captcha_data['gap_x'],
-        'gap_y': captcha_data['gap_y'],
-        'trap_x': captcha_data['trap_x'],
-        'trap_y': captcha_data['trap_y'],
-        'gap_width': captcha_data['gap_width'],
-        'gap_height': captcha_data['gap_height'],
-        'expire_time': captcha_data['expire_time']
+        'gap_x': params.gap_x,
+        'gap_y': params.gap_y,
+        'trap_x': params.trap_x,
+        'trap_y': params.trap_y,
+        'gap_width': captcha_generator.gap_width,
+        'gap_height': captcha_generator.gap_height,
+        'expire_time': captcha_generator.expire_time
     })
 
-@app.route('/bg_image/<verify_id>')
+def send_slide_image(verify_id, kind):
+    """发送背景图或缺口图：每张图最多编码一次，支持 ETag 条件请求"""
+    entry = verification_data.get(verify_id)
+    if entry is None:
+        return 'Invalid verify_id', 400
+
+    remaining = entry.start_time + captcha_generator.expire_time - time.time()
+    if remaining <= 0:
+        # 过期的验证信息立即释放
+        verification_data.free(verify_id)
+        return 'Invalid verify_id', 400
+
+    # 图片由参数和背景内容确定性渲染，两者都相同则字节相同，可作为强 ETag
+    bg_tag = captcha_generator.bg_cache.tag(entry.params.bg_index)
+    if bg_tag is None:
+        # 背景在验证码有效期内被移除，该验证码已无法显示
+        verification_data.free(verify_id)
+        return 'Background unavailable', 410
+    etag = f'{kind}-{verify_id}-{entry.params.seed:08x}-{bg_tag}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        attr = f'{kind}_png'
+        png_bytes = getattr(entry, attr)
+        if png_bytes is None:
+            try:
+                if kind == 'bg':
+                    image = captcha_generator.render_bg_image(entry.params)
+                else:
+                    image = captcha_generator.render_gap_image(entry.params)
+            except LookupError:
+                # 背景在验证码有效期内被移除，该验证码已无法显示
+                verification_data.free(verify_id)
+                return 'Background unavailable', 410
+            image_io = io.BytesIO()
+            image.save(image_io, format='PNG')
+            png_bytes = image_io.getvalue()
+            # 编码期间记录可能已被释放并复用，确认仍属于该验证ID再缓存
+            if verification_data.get(verify_id) is entry:
+                setattr(entry, attr, png_bytes)
+        response = Response(png_bytes, mimetype='image/png')
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = int(remaining)
+    return response
+
+@app.route('/bg_image/<verify_id>', methods=['GET', 'HEAD'])
 def get_bg_image(verify_id):
     """获取背景图片"""
-    if verify_id in verification_data:
-        bg_byte_io = io.BytesIO()
-        verification_data[verify_id]['bg_image'].save(bg_byte_io, format='PNG')
-        bg_byte_io.seek(0)
-        return send_file(bg_byte_io, mimetype='image/png')
-    return 'Invalid verify_id', 400
-
-@app.route('/gap_image/<verify_id>')
+    return send_slide_image(verify_id, 'bg')
+
+@app.route('/gap_image/<verify_id>', methods=['GET', 'HEAD'])
 def get_gap_image(verify_id):
     """获取缺口图片"""
-    if verify_id in verification_data:
-        gap_byte_io = io.BytesIO()
-        verification_data[verify_id]['gap_image'].save(gap_byte_io, format='PNG')
-        gap_byte_io.seek(0)
-        return send_file(gap_byte_io, mimetype='image/png')
-    return 'Invalid verify_id', 400
+    return send_slide_image(verify_id, 'gap')
+
+# 统计接口只对管理员开放（设置 CAPTCHA_ADMIN_TOKEN 后启用，请求头 X-Admin-Token 携带令牌）
+ADMIN_TOKEN = os.environ.get('CAPTCHA_ADMIN_TOKEN', '')
+
+def check_admin_token():
+    """令牌有误时返回错误响应，否则返回 None"""
+    if not ADMIN_TOKEN:
+        return 'Not Found', 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return 'Forbidden', 403
+    return None
+
+@app.route('/bg_cache_stats')
+def get_bg_cache_stats():
+    """获取背景图缓存统计"""
+    return check_admin_token() or jsonify(captcha_generator.bg_cache.stats())
+
+@app.route('/store_stats')
+def get_store_stats():
+    """获取验证信息存储的占用和淘汰统计"""
+    return check_admin_token() or jsonify(verification_data.stats())
 
 @app.route('/verify', methods=['POST'])
 def verify():
@@ -605,15 +648,16 @@ def verify():
     x = data.get('x')
     tracks = data.get('mouse_tracks', [])
     
-    if not verify_id or verify_id not in verification_data:
+    verify_data = verification_data.get(verify_id) if verify_id else None
+    if verify_data is None:
         return jsonify({'success': False, 'message': '验证失败，请重试'})
     
-    verify_data = verification_data[verify_id]
+    params = verify_data.params
     
     # 检查是否过期
-    elapsed_time = time.time() - verify_data['start_time']
-    if elapsed_time > verify_data['expire_time']:
-        del verification_data[verify_id]
+    elapsed_time = time.time() - verify_data.start_time
+    if elapsed_time > captcha_generator.expire_time:
+        verification_data.free(verify_id)
         return jsonify({'success': False, 'message': '验证码已过期'})
     
     # 分析轨迹
@@ -625,14 +669,14 @@ def verify():
         })
     
     # 检查是否点击了陷阱缺口
-    trap_distance = abs(x - verify_data['trap_x'])
+    trap_distance = abs(x - params.trap_x)
     if trap_distance <= 10:
         return jsonify({'success': False, 'message': '验证失败，请重试'})
     
     # 验证位置（允许10像素的误差）
-    if abs(x - verify_data['gap_x']) <= 10:
+    if abs(x - params.gap_x) <= 10:
         # 验证成功后删除验证数据
-        del verification_data[verify_id]
+        verification_data.free(verify_id)
         return jsonify({'success': True, 'message': '验证成功'})
     
     return jsonify({'success': False, 'message': '验证失败，请重试'})
@@ -0,0 +1,250 @@
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+# 判定结果编号 -> 提示信息（analyze_batch 内部用编号表示结果）
+REASONS = (
+    "轨迹正常",
+    "轨迹过短",
+    "滑动时间过长",
+    "滑动时间过短",
+    "移动速度异常",
+    "移动速度过快",
+    "垂直移动幅度过大",
+    "移动轨迹过于平直",
+)
+(OK, TOO_SHORT, TOO_SLOW, TOO_QUICK, ZERO_DT, TOO_FAST, TOO_STEEP, TOO_STRAIGHT) = range(len(REASONS))
+
+_point_fields = itemgetter('x', 'y', 'timestamp')
+
+
+class TrackAnalyzer:
+    """鼠标轨迹分析：轨迹一次性转换为连续的 NumPy 数组，速度、偏移和Y轴变化均向量化计算"""
+
+    def __init__(self, max_speed=1500):
+        self.min_track_length = 10     # 最小轨迹点数
+        self.max_speed = max_speed     # 最大速度（像素/秒）
+        self.max_deviation = 50        # 最大垂直偏移
+        self.min_y_changes = 3         # 最小Y轴变化次数
+        self.min_y_change = 1          # 最小Y轴变化幅度（像素）
+        self.max_slide_time = 5000     # 最大滑动时间（毫秒）
+        self.min_slide_time = 100      # 最小滑动时间（毫秒）
+
+    @staticmethod
+    def to_arrays(tracks):
+        """把 [{x, y, timestamp}, ...] 转换为 x、y、timestamp 三个 float64 数组"""
+        data = _points_to_array(tracks, len(tracks))
+        return data[:, 0], data[:, 1], data[:, 2]
+
+    def analyze_tracks(self, tracks):
+        """分析鼠标轨迹是否合理"""
+        if len(tracks) < self.min_track_length:
+            return False, REASONS[TOO_SHORT]
+        return self.analyze_arrays(*self.to_arrays(tracks))
+
+    def analyze_arrays(self, x, y, t):
+        """分析已转换为数组的轨迹（时间单位为毫秒）"""
+        if len(t) < self.min_track_length:
+            return False, REASONS[TOO_SHORT]
+
+        # 计算总滑动时间
+        total_time = t[-1] - t[0]
+        if total_time > self.max_slide_time:
+            return False, REASONS[TOO_SLOW]
+        if total_time < self.min_slide_time:
+            return False, REASONS[TOO_QUICK]
+
+        dy = np.diff(y)
+        code = self._first_abnormal_step(x, t, dy)
+        if code != OK:
+            return False, REASONS[code]
+
+        # 如果Y轴变化次数太少，判定为机器操作
+        if self._count_y_changes(y, dy)[0] < self.min_y_changes:
+            return False, REASONS[TOO_STRAIGHT]
+
+        return True, REASONS[OK]
+
+    def _first_abnormal_step(self, x, t, dy):
+        """逐点检查时按 时间间隔为0、速度、垂直偏移 的顺序判断，返回第一个异常步的结果编号"""
+        # 相邻两点间的时间（秒）、位移和速度
+        dt = np.diff(t) / 1000
+        dx = np.diff(x)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            speed = np.sqrt(dx * dx + dy * dy) / dt
+
+        zero_dt = dt == 0
+        too_fast = speed > self.max_speed
+        too_steep = np.abs(dy) > self.max_deviation
+        abnormal = zero_dt | too_fast | too_steep
+        if not abnormal.any():
+            return OK
+        i = int(np.argmax(abnormal))
+        if zero_dt[i]:
+            return ZERO_DT
+        if too_fast[i]:
+            return TOO_FAST
+        return TOO_STEEP
+
+    def _count_y_changes(self, y, dy, last_y=None):
+        """统计Y轴变化次数（相对上一次变化时的Y坐标，变化幅度不小于 min_y_change），返回 (次数, 最后一次变化的Y)
+
+        y 包含起点，last_y 默认为起点的Y坐标（分块分析时由上一块传入）
+        """
+        last_y = y[0] if last_y is None else last_y
+        # 每一步要么不动、要么变化幅度达到阈值时，“上次变化的Y”总等于上一个点的Y，
+        # 计数就是非零位移的个数；整数坐标且阈值不超过1像素时总是如此
+        if last_y == y[0] and np.all((dy == 0) | (np.abs(dy) >= self.min_y_change)):
+            return int(np.count_nonzero(dy)), y[-1]
+        y_changes = 0
+        for value in y[1:].tolist():
+            if abs(value - last_y) >= self.min_y_change:
+                y_changes += 1
+                last_y = value
+        return y_changes, last_y
+
+    def analyze_batch(self, traces):
+        """批量分析多条轨迹，结果与逐条调用 analyze_tracks 相同"""
+        lengths = np.array([len(tracks) for tracks in traces], dtype=np.int64)
+        data = _points_to_array(chain.from_iterable(traces), int(lengths.sum()))
+        return self.analyze_batch_arrays(data[:, 0], data[:, 1], data[:, 2], lengths)
+
+    def analyze_batch_arrays(self, x, y, t, lengths):
+        """批量分析首尾相接存放的多条轨迹，lengths 为每条轨迹的点数"""
+        lengths = np.asarray(lengths, dtype=np.int64)
+        count = len(lengths)
+        codes = np.full(count, OK, dtype=np.int8)
+        if count == 0:
+            return []
+        starts = np.cumsum(lengths) - lengths
+        ends = starts + lengths - 1
+
+        # 轨迹长度和总滑动时间
+        long_enough = lengths >= self.min_track_length
+        total_time = np.zeros(count)
+        total_time[long_enough] = t[ends[long_enough]] - t[starts[long_enough]]
+        codes[:] = np.select(
+            [~long_enough, total_time > self.max_slide_time, total_time < self.min_slide_time],
+            [TOO_SHORT, TOO_SLOW, TOO_QUICK], OK)
+
+        if len(t) >= 2:
+            # 每一步属于哪条轨迹；跨越两条轨迹边界的“步”不参与判断
+            segment = np.repeat(np.arange(count), lengths)
+            step_segment = segment[:-1]
+            same_track = step_segment == segment[1:]
+
+            dt = np.diff(t) / 1000
+            dx = np.diff(x)
+            dy = np.diff(y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                speed = np.sqrt(dx * dx + dy * dy) / dt
+            step_codes = np.select(
+                [dt == 0, speed > self.max_speed, np.abs(dy) > self.max_deviation],
+                [ZERO_DT, TOO_FAST, TOO_STEEP], OK).astype(np.int8)
+            step_codes[~same_track] = OK
+
+            # 每条轨迹第一个异常步的结果
+            abnormal = np.flatnonzero(step_codes)
+            failed, first = np.unique(step_segment[abnormal], return_index=True)
+            pending = codes[failed] == OK
+            codes[failed[pending]] = step_codes[abnormal[first[pending]]]
+
+            # Y轴变化次数：满足快速计数条件的轨迹直接按非零位移计数，其余逐条计算
+            moved = (dy != 0) & same_track
+            y_changes = np.bincount(step_segment[moved], minlength=count)
+            irregular = same_track & (dy != 0) & (np.abs(dy) < self.min_y_change)
+            for i in np.unique(step_segment[irregular]).tolist():
+                segment_y = y[starts[i]:ends[i] + 1]
+                y_changes[i] = self._count_y_changes(segment_y, np.diff(segment_y))[0]
+        else:
+            y_changes = np.zeros(count, dtype=np.int64)
+
+        codes[(codes == OK) & (y_changes < self.min_y_changes)] = TOO_STRAIGHT
+        return [(code == OK, REASONS[code]) for code in codes.tolist()]
+
+
+class IncrementalTrackAnalyzer:
+    """增量轨迹分析：轨迹点分块喂入，只保留运行统计，触发硬性限制时立即拒绝
+
+    全部喂完后 finish() 按与 TrackAnalyzer.analyze_tracks 相同的顺序判断（点数、总时长、逐步检查、
+    Y轴变化），结果与分析整条轨迹相同；唯一的区别是任一点距起点超过 max_slide_time 就会提前拒绝
+    （时间戳倒退的轨迹会更严格）。提前拒绝后继续喂入的点只计入点数和终点，不再分析；
+    调用方在 feed 返回 False 后停止喂入时结果仍是拒绝，但原因只依据已收到的点。
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.count = 0           # 已接收的点数
+        self.reason = None       # 提前拒绝的原因编号
+        self._first_t = None     # 起点时间戳
+        self._last = None        # 上一块的最后一个点 (x, y, timestamp)
+        self._last_y = None      # 最后一次Y轴变化时的Y坐标
+        self.y_changes = 0       # Y轴变化次数
+
+    @property
+    def rejected(self):
+        return self.reason is not None
+
+    def feed(self, tracks):
+        """喂入一块 [{x, y, timestamp}, ...]，返回是否仍可能通过"""
+        if not tracks:
+            return not self.rejected
+        return self.feed_arrays(*TrackAnalyzer.to_arrays(tracks))
+
+    def feed_arrays(self, x, y, t):
+        """喂入一块已转换为数组的轨迹点，返回是否仍可能通过"""
+        if len(t) == 0:
+            return not self.rejected
+        if self.rejected:
+            # 已拒绝：只记录点数和终点，finish() 仍按整条轨迹的顺序给出原因
+            self.count += len(t)
+            self._last = (x[-1], y[-1], t[-1])
+            return False
+        analyzer = self.analyzer
+        if self._last is None:
+            self._first_t = t[0]
+            self._last_y = y[0]
+        else:
+            # 把上一块的最后一个点接在前面，跨块的那一步也参与检查
+            x = np.concatenate(([self._last[0]], x))
+            y = np.concatenate(([self._last[1]], y))
+            t = np.concatenate(([self._last[2]], t))
+        self.count += len(t) if self._last is None else len(t) - 1
+        self._last = (x[-1], y[-1], t[-1])
+
+        if np.any(t - self._first_t > analyzer.max_slide_time):
+            self.reason = TOO_SLOW
+            return False
+        if len(t) < 2:
+            return True
+        dy = np.diff(y)
+        code = analyzer._first_abnormal_step(x, t, dy)
+        if code != OK:
+            self.reason = code
+            return False
+        y_changes, self._last_y = analyzer._count_y_changes(y, dy, self._last_y)
+        self.y_changes += y_changes
+        return True
+
+    def finish(self):
+        """所有点都已喂入，返回 (是否通过, 原因)；判断顺序与 TrackAnalyzer.analyze_arrays 相同"""
+        analyzer = self.analyzer
+        if self.count < analyzer.min_track_length:
+            return False, REASONS[TOO_SHORT]
+        total_time = self._last[2] - self._first_t
+        if total_time > analyzer.max_slide_time:
+            return False, REASONS[TOO_SLOW]
+        if total_time < analyzer.min_slide_time:
+            return False, REASONS[TOO_QUICK]
+        if self.rejected:
+            return False, REASONS[self.reason]
+        if self.y_changes < analyzer.min_y_changes:
+            return False, REASONS[TOO_STRAIGHT]
+        return True, REASONS[OK]
+
+
+def _points_to_array(points, count):
+    """把轨迹点字典一次性展开为 (点数, 3) 的 float64 数组，不创建中间元组列表"""
+    values = chain.from_iterable(map(_point_fields, points))
+    return np.fromiter(values, dtype=np.float64, count=count * 3).reshape(count, 3)
@@ -0,0 +1,82 @@
+import base64
+import binascii
+
+import numpy as np
+
+# 紧凑轨迹格式（base64 编码）：
+#   1 字节版本号、1 字节每点字段数（2 = x,y；3 = x,y,timestamp）
+#   varint 点数，随后每个点的各字段依次为 zigzag varint：第一个点是绝对值，其余是与前一点的差值
+TRACK_FORMAT_VERSION = 1
+MAX_VARINT_BYTES = 10
+MAX_ABS_VALUE = 1 << 48  # 毫秒时间戳约 2^41；留足余量，5000 个点累加也不会溢出 int64
+
+
+def _zigzag(values):
+    return (values << 1) ^ (values >> 63)
+
+
+def encode_track(points):
+    """把 [(x, y), ...] 或 [(x, y, timestamp), ...] 编码为紧凑轨迹字符串"""
+    array = np.asarray(points, dtype=np.int64)
+    if array.ndim != 2 or array.shape[1] not in (2, 3):
+        raise ValueError('轨迹点必须是 (x, y) 或 (x, y, timestamp)')
+    deltas = np.diff(array, axis=0, prepend=np.zeros((1, array.shape[1]), dtype=np.int64))
+    values = [len(array)] + _zigzag(deltas).astype(np.uint64).ravel().tolist()
+
+    out = bytearray((TRACK_FORMAT_VERSION, array.shape[1]))
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return base64.b64encode(bytes(out)).decode('ascii')
+
+
+def decode_track(blob, fields, max_points, max_bytes):
+    """解码紧凑轨迹字符串，返回形状为 (点数, fields) 的 int64 数组；格式错误或超出限制时抛出 ValueError
+
+    max_bytes 限制解码后的字节数，在 base64 解码前按字符串长度先检查一次
+    """
+    if not isinstance(blob, str):
+        raise ValueError('轨迹必须是 base64 字符串')
+    if len(blob) > (max_bytes + 2) // 3 * 4:
+        raise ValueError('轨迹数据过大')
+    try:
+        data = base64.b64decode(blob, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('轨迹不是有效的 base64') from None
+    if len(data) < 3 or data[0] != TRACK_FORMAT_VERSION or data[1] != fields:
+        raise ValueError('轨迹格式不匹配')
+
+    raw = np.frombuffer(data, dtype=np.uint8, offset=2)
+    if raw[-1] & 0x80:
+        raise ValueError('轨迹数据不完整')
+
+    # 最高位为 0 的字节是每个 varint 的最后一个字节
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    if np.max(ends - starts) >= MAX_VARINT_BYTES:
+        raise ValueError('轨迹数据格式错误')
+    if len(starts) > 1 + max_points * fields:
+        raise ValueError('轨迹点过多')
+
+    # 每个字节在所属 varint 中的序号决定左移位数，再按 varint 分段求和
+    position = np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)
+    chunks = (raw & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    values = np.add.reduceat(chunks, starts)
+
+    count = int(values[0])
+    if count > max_points:
+        raise ValueError('轨迹点过多')
+    if len(values) != 1 + count * fields:
+        raise ValueError('轨迹点数与数据不符')
+
+    # zigzag 解码后按点累加差值
+    zigzag = values[1:]
+    deltas = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+    if np.any(np.abs(deltas) >= MAX_ABS_VALUE):
+        raise ValueError('轨迹坐标超出范围')
+    points = np.cumsum(deltas.reshape(count, fields), axis=0)
+    if count and np.any(np.abs(points) >= MAX_ABS_VALUE):
+        raise ValueError('轨迹坐标超出范围')
+    return points
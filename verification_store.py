@@ -0,0 +1,168 @@
+import math
+import secrets
+import threading
+import time
+from collections import deque
+
+
+class VerificationStore:
+    """定长验证信息存储
+
+    - 启动时预分配全部记录（__slots__ 对象），空闲槽位用栈管理，分配和释放都是 O(1)
+    - 验证ID由 代数 和 槽位号 组成，槽位每次释放时换一个随机代数，ID 无法推测，旧ID也不会误指向新记录
+    - 过期由时间轮处理：按过期时刻放入对应的桶，时钟前进时只处理到期的桶
+    - 存储已满时淘汰最早过期的记录，内存占用不随请求量增长
+    - 提前释放的记录在桶中留下失效条目，条目总数超过容量的两倍时压缩时间轮，桶的总长度有上限
+    """
+
+    GENERATION_BITS = 32
+
+    def __init__(self, capacity, ttl, record_type, tick=1.0):
+        self.capacity = capacity      # 最多同时存在的验证信息数量
+        self.ttl = ttl                # 有效期（秒）
+        self.tick = tick              # 时间轮刻度（秒）
+        self._slot_bits = max(1, (capacity - 1).bit_length())
+
+        self._lock = threading.Lock()
+        self._records = [record_type() for _ in range(capacity)]
+        self._generations = [secrets.randbits(self.GENERATION_BITS) for _ in range(capacity)]
+        self._in_use = [False] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+
+        # 时间轮：桶数覆盖一个完整有效期，桶中保存 (槽位, 代数)
+        self._wheel = [deque() for _ in range(math.ceil(ttl / tick) + 2)]
+        self._wheel_entries = 0       # 所有桶中的条目数（含已释放记录留下的失效条目）
+        self._current_tick = self._tick_of(time.time())
+
+        # 统计
+        self.allocated = 0
+        self.freed = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _tick_of(self, timestamp):
+        return int(timestamp // self.tick)
+
+    def _make_id(self, slot):
+        return str((self._generations[slot] << self._slot_bits) | slot)
+
+    def _parse_id(self, verify_id):
+        try:
+            value = int(verify_id)
+        except (TypeError, ValueError):
+            return None
+        slot = value & ((1 << self._slot_bits) - 1)
+        if value < 0 or slot >= self.capacity:
+            return None
+        if not self._in_use[slot] or self._generations[slot] != value >> self._slot_bits:
+            return None
+        return slot
+
+    def allocate(self, params, now=None):
+        """分配一条记录并写入参数，返回 (验证ID, 记录)；记录在锁内填好，其他线程按ID取到时参数已就绪"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._advance(now)
+            if not self._free:
+                self._evict_oldest()
+            slot = self._free.pop()
+            record = self._records[slot]
+            record.clear()
+            record.params = params
+            record.start_time = now
+            self._in_use[slot] = True
+            # 向上取整，保证处理该桶时记录一定已经过期
+            expire_tick = math.ceil((now + self.ttl) / self.tick)
+            self._wheel[expire_tick % len(self._wheel)].append((slot, self._generations[slot]))
+            self._wheel_entries += 1
+            self.allocated += 1
+            return self._make_id(slot), record
+
+    def get(self, verify_id):
+        """按验证ID取记录，ID无效或已释放时返回 None"""
+        with self._lock:
+            self._advance(time.time())
+            slot = self._parse_id(verify_id)
+            return None if slot is None else self._records[slot]
+
+    def __contains__(self, verify_id):
+        return self.get(verify_id) is not None
+
+    def free(self, verify_id):
+        """释放记录，返回是否确实释放了"""
+        with self._lock:
+            slot = self._parse_id(verify_id)
+            if slot is None:
+                return False
+            self._release(slot)
+            self.freed += 1
+            # 有效条目不超过容量，超过两倍时至少一半是失效条目，压缩的开销分摊到每次释放为 O(1)
+            if self._wheel_entries > 2 * self.capacity:
+                self._compact()
+            return True
+
+    def _compact(self):
+        """去掉时间轮中已释放记录留下的失效条目"""
+        self._wheel_entries = 0
+        for i, bucket in enumerate(self._wheel):
+            live = deque(entry for entry in bucket if self._is_live(*entry))
+            self._wheel[i] = live
+            self._wheel_entries += len(live)
+
+    def _is_live(self, slot, generation):
+        return self._in_use[slot] and self._generations[slot] == generation
+
+    def _release(self, slot):
+        self._records[slot].clear()
+        self._in_use[slot] = False
+        generation = self._generations[slot]
+        while generation == self._generations[slot]:
+            generation = secrets.randbits(self.GENERATION_BITS)
+        self._generations[slot] = generation
+        self._free.append(slot)
+
+    def _advance(self, now):
+        """时钟前进到 now，释放到期桶中仍然有效的记录"""
+        target = self._tick_of(now)
+        if target <= self._current_tick:
+            return
+        # 相隔超过一圈时只需把每个桶处理一次
+        start = max(self._current_tick + 1, target - len(self._wheel) + 1)
+        for tick in range(start, target + 1):
+            bucket = self._wheel[tick % len(self._wheel)]
+            for slot, generation in bucket:
+                if self._is_live(slot, generation):
+                    self._release(slot)
+                    self.expired += 1
+            self._wheel_entries -= len(bucket)
+            bucket.clear()
+        self._current_tick = target
+
+    def _evict_oldest(self):
+        """存储已满：从最近的桶开始找到最早过期的记录并淘汰"""
+        size = len(self._wheel)
+        for offset in range(1, size + 1):
+            bucket = self._wheel[(self._current_tick + offset) % size]
+            while bucket:
+                slot, generation = bucket.popleft()
+                self._wheel_entries -= 1
+                if self._is_live(slot, generation):
+                    self._release(slot)
+                    self.evicted += 1
+                    return
+
+    def __len__(self):
+        return self.capacity - len(self._free)
+
+    def stats(self):
+        """返回占用和淘汰统计"""
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'occupancy': self.capacity - len(self._free),
+                'allocated': self.allocated,
+                'freed': self.freed,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'wheel_entries': self._wheel_entries,
+            }
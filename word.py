@@ -1,10 +1,12 @@
 from flask import Flask, request, session, send_file, jsonify
-from PIL import Image, ImageDraw, ImageFont, ImageTransform
+from PIL import Image, ImageDraw, ImageTransform
 import random
 import string
 import io
 import time
 import base64
+import threading
+from glyph_atlas import HanziAtlas, hanzi_atlas_path
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'  # 生产环境需要更安全的密钥
@@ -20,6 +22,21 @@ TIMEOUT = 30  # 超时时间（秒）
 # 1000个常用汉字列表
 HANZI_LIST = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社事者平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
 
+# 汉字字形图集（首次启动时构建并保存，之后内存映射加载）
+HANZI_ATLAS_PATH = hanzi_atlas_path(HANZI_LIST, FONT_SIZE)
+hanzi_atlas = None
+hanzi_atlas_lock = threading.Lock()
+
+def get_hanzi_atlas():
+    """获取汉字字形图集，字体只在构建图集时加载一次"""
+    global hanzi_atlas
+    if hanzi_atlas is None:
+        # 多个请求线程同时首次调用时只构建一次
+        with hanzi_atlas_lock:
+            if hanzi_atlas is None:
+                hanzi_atlas = HanziAtlas.load_or_build(HANZI_ATLAS_PATH, "FZSTK.TTF", HANZI_LIST, FONT_SIZE)
+    return hanzi_atlas
+
 def generate_hanzi_list():
     """随机生成4个汉字"""
     return random.sample(HANZI_LIST, 4)
@@ -39,16 +56,15 @@ def generate_captcha_image(hanzi_list):
     random.shuffle(shuffled_hanzi_list)
 
     # 绘制汉字并扭曲
+    atlas = get_hanzi_atlas()
     positions = []
     for i, hanzi in enumerate(shuffled_hanzi_list):
         x = random.randint(50 + i * 80, 100 + i * 80)
         y = random.randint(50, IMG_HEIGHT - 50)
         positions.append((x, y))
 
-        # 创建一个新的图像用于绘制单个汉字
-        char_img = Image.new('RGB', (FONT_SIZE, FONT_SIZE), color=(255, 255, 255))
-        char_draw = ImageDraw.Draw(char_img)
-        char_draw.text((0, 0), hanzi, fill=(0, 0, 0), font=ImageFont.truetype("FZSTK.TTF", FONT_SIZE))
+        # 从图集取出预渲染的汉字位图
+        char_img = atlas.image(hanzi)
 
         # 扭曲汉字
         distortion = random.uniform(-0.1, 0.1)
@@ -408,4 +424,5 @@ def index():
     """
 
 if __name__ == '__main__':
+    get_hanzi_atlas()
     app.run(host='0.0.0.0', port=8082)